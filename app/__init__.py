@@ -1,10 +1,11 @@
 import os
 
-from flask import Flask, session
+from flask import Flask, g, has_app_context
+from sqlalchemy import event, insert
 
-from .appointments.routes import appointments_bp
 from .config import DevelopmentConfig, config_map
-from .extensions import babel, csrf, db, limiter, login_manager, migrate
+from .extensions import babel, cache, csrf, db, limiter, login_manager, migrate
+from .request_limits import Request
 
 
 def create_app(config_name: str = None):
@@ -12,9 +13,9 @@ def create_app(config_name: str = None):
         config_name = os.environ.get("FLASK_ENV", "development")
 
     app = Flask(__name__)
+    app.request_class = Request
     cfg = config_map.get(config_name, DevelopmentConfig)
     app.config.from_object(cfg)
-    app.register_blueprint(appointments_bp)
 
     app.config["WTF_CSRF_HEADERS"] = ["X-CSRFToken"]
 
@@ -25,23 +26,22 @@ def create_app(config_name: str = None):
     csrf.init_app(app)
     limiter.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
 
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
     login_manager.login_message_category = "warning"
 
-    from .models import User
-
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        from .user_cache import get_user
+
+        return get_user(int(user_id))
 
     # ── Language / Babel ─────────────────────────────────────────────────────
-    def get_locale():
-        lang = session.get("lang", "en")
-        return lang if lang in ("en", "hi") else "en"
+    from .lang.helpers import get_active_language
 
-    babel.init_app(app, locale_selector=get_locale)
+    babel.init_app(app, locale_selector=get_active_language)
 
     from .lang.routes import lang_bp
 
@@ -49,13 +49,17 @@ def create_app(config_name: str = None):
 
     @app.context_processor
     def inject_globals():
-        lang = session.get("lang", "en")
+        lang = get_active_language()
         return {
             "current_lang": lang,
             "is_hindi": lang == "hi",
         }
 
     # ── Feature blueprints ───────────────────────────────────────────────────
+    # Imported here rather than at module top so `import app` (scripts,
+    # migrations) doesn't drag in every route module and its dependencies.
+    # Registration itself stays eager: templates url_for() across blueprints.
+    from .appointments.routes import appointments_bp
     from .auth.routes import auth_bp
     from .email.routes import email_bp
     from .history.routes import history_bp
@@ -79,5 +83,39 @@ def create_app(config_name: str = None):
     app.register_blueprint(history_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(email_bp)
+    app.register_blueprint(appointments_bp)
+
+    if app.config.get("WHISPER_PRELOAD"):
+        from .appointments.transcriber import init_app as init_transcriber
+
+        init_transcriber(app)
+
+    if app.config.get("EMBED_PRELOAD"):
+        from .rag.vector_store import init_app as init_embedder
+
+        init_embedder(app)
 
     return app
+
+
+# ── Buffered audit rows ────────────────────────────────────────────────────────
+# Routes can buffer audit rows in g.audit_buf (appointments/routes._log_audit).
+# They go out as one INSERT inside the commit of the changes they record, so
+# the two land together; a rollback drops them with the changes.
+
+
+@event.listens_for(db.session, "before_commit")
+def _write_audit_buf(session):
+    if not has_app_context():
+        return
+    buf = g.pop("audit_buf", None)
+    if buf:
+        from .models import AuditLog
+
+        session.execute(insert(AuditLog), buf)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _drop_audit_buf(session):
+    if has_app_context():
+        g.pop("audit_buf", None)
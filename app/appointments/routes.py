@@ -1,11 +1,16 @@
-import json
 import os
+import secrets
+import shutil
 from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import groupby
 
 from flask import (
     Blueprint,
     abort,
+    current_app,
     flash,
+    g,
     jsonify,
     redirect,
     render_template,
@@ -13,94 +18,110 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload, load_only
 from werkzeug.utils import secure_filename
 
 from ..extensions import db
-from ..models import Appointment, AppointmentAction, AuditLog, Session
+from ..lang.helpers import get_active_language
+from ..models import Appointment, AppointmentAction, Session
+from ..request_limits import max_content_length
 from .forms import AudioUploadForm, ConsentForm, ManualNotesForm
-from .summariser import extract_actions, summarise
-from .transcriber import transcribe_audio, whisper_available
+from .tasks import expire_stale, submit_appointment
 
 appointments_bp = Blueprint("appointments", __name__, url_prefix="/appointments")
 
 ALLOWED_AUDIO = {"mp3", "wav", "m4a", "webm", "ogg"}
-MAX_AUDIO_MB = 50
 
 
 def _utcnow():
-    return datetime.now(timezone.utc).isoformat()
+    """Request-scoped timestamp — computed once, shared by every row written."""
+    if "utc_now_iso" not in g:
+        g.utc_now_iso = datetime.now(timezone.utc).isoformat()
+    return g.utc_now_iso
+
+
+# Ownership checks are cached on g so repeat lookups in one request are free
 
 
 def _own_session_or_404(session_id: int) -> Session:
-    s = db.session.get(Session, session_id)
-    if s is None or s.user_id != current_user.id:
-        abort(404)
+    cache = g.setdefault("own_sessions", {})
+    s = cache.get(session_id)
+    if s is None:
+        s = db.session.get(Session, session_id)
+        if s is None or s.user_id != current_user.id:
+            abort(404)
+        cache[session_id] = s
     return s
 
 
-def _own_appointment_or_404(appt_id: int) -> Appointment:
-    a = db.session.get(Appointment, appt_id)
-    if a is None or a.user_id != current_user.id:
-        abort(404)
+def _own_appointment_or_404(appt_id: int, options=()) -> Appointment:
+    cache = g.setdefault("own_appointments", {})
+    a = cache.get(appt_id)
+    if a is None:
+        a = db.session.get(Appointment, appt_id, options=options)
+        if a is None or a.user_id != current_user.id:
+            abort(404)
+        cache[appt_id] = a
     return a
 
 
 def _log_audit(session_id, event, detail):
-    db.session.add(
-        AuditLog(
-            user_id=current_user.id,
-            session_id=session_id,
-            event_type=event,
-            event_detail=json.dumps(detail),
-            created_at=_utcnow(),
-        )
+    """Buffer an audit row; it is written in one INSERT with the next commit."""
+    g.setdefault("audit_buf", []).append(
+        {
+            "user_id": current_user.id,
+            "session_id": session_id,
+            "event_type": event,
+            "event_detail": detail,
+            "created_at": _utcnow(),
+        }
     )
 
 
 def _audio_upload_dir(session_id: int) -> str:
-    from flask import current_app
-
     base = current_app.config["UPLOAD_FOLDER"]
     d = os.path.join(base, "appointments", str(current_user.id), str(session_id))
     os.makedirs(d, exist_ok=True)
     return d
 
 
-def _process_and_save(appt: Appointment, text: str):
-    """Run summariser, save actions, update appointment record."""
-    appt.status = "summarising"
-    db.session.commit()
+def _save_audio(file_storage, path: str):
+    """
+    Write an uploaded audio stream to `path` with a 1 MB copy buffer.
+    Goes via a .part file so a half-written recording is never picked up.
+    """
+    tmp = path + ".part"
+    with open(tmp, "wb", buffering=0) as f:
+        shutil.copyfileobj(file_storage.stream, f, length=1 << 20)
+        # Read once by Whisper later — don't let it crowd the page cache
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    os.replace(tmp, path)
 
-    result = summarise(text)
 
-    if not result["success"]:
-        appt.status = "failed"
-        db.session.commit()
-        return False, result["error"]
-
-    summary = result["summary"]
-    appt.summary_json = json.dumps(summary)
-    appt.followup_date = summary.get("followup_date")
-    appt.status = "done"
-
-    # Save actions
-    AppointmentAction.query.filter_by(appointment_id=appt.id).delete()
-
-    for action_data in extract_actions(summary):
-        db.session.add(
-            AppointmentAction(
-                appointment_id=appt.id,
-                action_type=action_data["action_type"],
-                description=action_data["description"],
-                detail=action_data["detail"],
-                due_date=action_data["due_date"],
-                is_completed=0,
-                created_at=_utcnow(),
-            )
-        )
+@lru_cache(maxsize=1)
+def _whisper_ok() -> bool:
+    """Probe once per process; the transcriber module loads only on demand."""
+    from .transcriber import whisper_available
 
-    db.session.commit()
-    return True, None
+    return whisper_available()
+
+
+def _enqueue(appt: Appointment, transcribe: bool):
+    """Hand the appointment to the background worker (language from session)."""
+    submit_appointment(
+        current_app._get_current_object(),
+        appt.id,
+        get_active_language(),
+        transcribe=transcribe,
+    )
+
+
+@appointments_bp.errorhandler(413)
+def _too_large(e):
+    max_mb = request.max_content_length // (1024 * 1024)
+    flash(f"File too large. Maximum size is {max_mb}MB.", "error")
+    return redirect(request.url)
 
 
 # ── List ───────────────────────────────────────────────────────────────────────
@@ -110,8 +131,19 @@ def _process_and_save(appt: Appointment, text: str):
 @login_required
 def list_appointments(session_id):
     s = _own_session_or_404(session_id)
+    # List view only — skip the transcript and summary blobs
     appts = (
         Appointment.query.filter_by(session_id=session_id)
+        .options(
+            load_only(
+                Appointment.id,
+                Appointment.title,
+                Appointment.capture_method,
+                Appointment.status,
+                Appointment.followup_date,
+                Appointment.created_at,
+            )
+        )
         .order_by(Appointment.created_at.desc())
         .all()
     )
@@ -126,7 +158,7 @@ def list_appointments(session_id):
 def new_appointment(session_id):
     s = _own_session_or_404(session_id)
     return render_template(
-        "appointments/new.html", session=s, whisper_ok=whisper_available()
+        "appointments/new.html", session=s, whisper_ok=_whisper_ok()
     )
 
 
@@ -135,6 +167,7 @@ def new_appointment(session_id):
 
 @appointments_bp.route("/session/<int:session_id>/record", methods=["GET", "POST"])
 @login_required
+@max_content_length("AUDIO_MAX_CONTENT_LENGTH")
 def record_appointment(session_id):
     s = _own_session_or_404(session_id)
     form = ConsentForm()
@@ -155,11 +188,10 @@ def record_appointment(session_id):
 
     # Save audio file
     upload_dir = _audio_upload_dir(session_id)
-    filename = secure_filename(
-        f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}.webm"
-    )
+    # Random token keeps names unique; created_at carries the ordering
+    filename = f"recording_{secrets.token_hex(6)}.webm"
     audio_path = os.path.join(upload_dir, filename)
-    audio_blob.save(audio_path)
+    _save_audio(audio_blob, audio_path)
 
     # Create appointment record
     appt = Appointment(
@@ -175,33 +207,15 @@ def record_appointment(session_id):
         created_at=_utcnow(),
     )
     db.session.add(appt)
-    db.session.commit()
-
-    # Transcribe
-    t_result = transcribe_audio(audio_path)
-    if not t_result["success"]:
-        appt.status = "failed"
-        db.session.commit()
-        flash(
-            f"Transcription failed: {t_result['error']} "
-            "You can add notes manually instead.",
-            "error",
-        )
-        return redirect(url_for("appointments.detail", appt_id=appt.id))
-
-    appt.raw_transcript = t_result["transcript"]
-    db.session.commit()
-
-    # Summarise
-    ok, err = _process_and_save(appt, t_result["transcript"])
-    if not ok:
-        flash(f"Summary failed: {err}", "error")
-
+    db.session.flush()
     _log_audit(
         session_id, "appointment_created", {"appt_id": appt.id, "method": "recording"}
     )
     db.session.commit()
 
+    # Transcribe + summarise in the background; detail page polls status
+    _enqueue(appt, transcribe=True)
+
     return redirect(url_for("appointments.detail", appt_id=appt.id))
 
 
@@ -210,6 +224,7 @@ def record_appointment(session_id):
 
 @appointments_bp.route("/session/<int:session_id>/upload", methods=["GET", "POST"])
 @login_required
+@max_content_length("AUDIO_MAX_CONTENT_LENGTH")
 def upload_appointment(session_id):
     s = _own_session_or_404(session_id)
     form = AudioUploadForm()
@@ -220,22 +235,13 @@ def upload_appointment(session_id):
             flash("Please select an audio file.", "error")
             return render_template("appointments/upload.html", session=s, form=form)
 
-        # Size check
-        audio_file.seek(0, 2)
-        size_mb = audio_file.tell() / (1024 * 1024)
-        audio_file.seek(0)
-
-        if size_mb > MAX_AUDIO_MB:
-            flash(f"File too large. Maximum size is {MAX_AUDIO_MB}MB.", "error")
-            return render_template("appointments/upload.html", session=s, form=form)
-
+        # Oversize files never get here: AUDIO_MAX_CONTENT_LENGTH → _too_large()
         upload_dir = _audio_upload_dir(session_id)
-        filename = secure_filename(
-            f"upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}_"
-            f"{audio_file.filename}"
+        filename = (
+            f"upload_{secrets.token_hex(6)}_{secure_filename(audio_file.filename)}"
         )
         audio_path = os.path.join(upload_dir, filename)
-        audio_file.save(audio_path)
+        _save_audio(audio_file, audio_path)
 
         doctor = (form.doctor_name.data or "").strip()
         appt_date = (form.appointment_date.data or "").strip()
@@ -253,31 +259,14 @@ def upload_appointment(session_id):
             created_at=_utcnow(),
         )
         db.session.add(appt)
-        db.session.commit()
-
-        t_result = transcribe_audio(audio_path)
-        if not t_result["success"]:
-            appt.status = "failed"
-            db.session.commit()
-            flash(
-                f"Transcription failed: {t_result['error']} "
-                "Please add notes manually.",
-                "error",
-            )
-            return redirect(url_for("appointments.detail", appt_id=appt.id))
-
-        appt.raw_transcript = t_result["transcript"]
-        db.session.commit()
-
-        ok, err = _process_and_save(appt, t_result["transcript"])
-        if not ok:
-            flash(f"Summary failed: {err}", "error")
-
+        db.session.flush()
         _log_audit(
             session_id, "appointment_created", {"appt_id": appt.id, "method": "upload"}
         )
         db.session.commit()
 
+        _enqueue(appt, transcribe=True)
+
         return redirect(url_for("appointments.detail", appt_id=appt.id))
 
     return render_template("appointments/upload.html", session=s, form=form)
@@ -310,17 +299,14 @@ def manual_appointment(session_id):
             created_at=_utcnow(),
         )
         db.session.add(appt)
-        db.session.commit()
-
-        ok, err = _process_and_save(appt, notes)
-        if not ok:
-            flash(f"Summary failed: {err}", "error")
-
+        db.session.flush()
         _log_audit(
             session_id, "appointment_created", {"appt_id": appt.id, "method": "manual"}
         )
         db.session.commit()
 
+        _enqueue(appt, transcribe=False)
+
         return redirect(url_for("appointments.detail", appt_id=appt.id))
 
     return render_template("appointments/manual.html", session=s, form=form)
@@ -332,18 +318,21 @@ def manual_appointment(session_id):
 @appointments_bp.route("/<int:appt_id>")
 @login_required
 def detail(appt_id):
-    appt = _own_appointment_or_404(appt_id)
-    session = db.session.get(Session, appt.session_id)
-    summary = {}
-    if appt.summary_json:
-        try:
-            summary = json.loads(appt.summary_json)
-        except Exception:
-            pass
-
-    actions_by_type = {}
-    for a in appt.actions.order_by(AppointmentAction.action_type).all():
-        actions_by_type.setdefault(a.action_type, []).append(a)
+    # Parent session comes back in the same SELECT
+    appt = _own_appointment_or_404(appt_id, options=[joinedload(Appointment.session)])
+    if expire_stale(appt):
+        db.session.commit()
+    session = appt.session
+    summary = appt.summary_json or {}
+
+    # Rows arrive sorted by type, so grouping is a single pass
+    rows = appt.actions.order_by(
+        AppointmentAction.action_type, AppointmentAction.id
+    ).all()
+    actions_by_type = {
+        action_type: list(group)
+        for action_type, group in groupby(rows, key=lambda a: a.action_type)
+    }
 
     return render_template(
         "appointments/detail.html",
@@ -354,24 +343,43 @@ def detail(appt_id):
     )
 
 
+# ── Processing status (polled by detail page) ──────────────────────────────────
+
+
+@appointments_bp.route("/<int:appt_id>/status")
+@login_required
+def status(appt_id):
+    appt = _own_appointment_or_404(appt_id)
+    if expire_stale(appt):
+        db.session.commit()
+    return jsonify({"status": appt.status})
+
+
 # ── Toggle action complete ─────────────────────────────────────────────────────
 
 
 @appointments_bp.route("/action/<int:action_id>/toggle", methods=["POST"])
 @login_required
 def toggle_action(action_id):
-    action = db.session.get(AppointmentAction, action_id)
+    # Parent appointment rides along, so the ownership check needs no SELECT
+    action = db.session.get(
+        AppointmentAction,
+        action_id,
+        options=[joinedload(AppointmentAction.appointment)],
+    )
     if action is None:
         abort(404)
     _own_appointment_or_404(action.appointment_id)
 
-    action.is_completed = 0 if action.is_completed else 1
+    is_completed = 0 if action.is_completed else 1
+    action.is_completed = is_completed
     db.session.commit()
 
+    # Local value, not action.is_completed — that would reload after commit
     return jsonify(
         {
             "success": True,
-            "is_completed": action.is_completed,
+            "is_completed": is_completed,
         }
     )
 
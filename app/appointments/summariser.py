@@ -5,23 +5,173 @@ Appointment summariser using Ollama (llama3.2:3b).
 Takes raw transcript or manual notes and returns structured summary_json.
 Language-aware: responds in Hindi when session lang == 'hi'.
 """
-import json
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 
-import requests
+from .. import fastjson
+from ..lang.helpers import build_appointment_system_prompt, get_active_language
 
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
 OLLAMA_TIMEOUT = int(os.environ.get("OLLAMA_TIMEOUT", "120"))
+# Ollama is local, so a connection that takes longer than this means it's down
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "2"))
+# How long Ollama keeps the model loaded after a request (its default is 5m,
+# after which the next question pays a multi-second reload)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
 
+# ── Prompt/payload pieces that never change between calls ─────────────────────
+_BASE_PAYLOAD = {
+    "model": OLLAMA_MODEL,
+    "stream": True,
+    "keep_alive": OLLAMA_KEEP_ALIVE,
+    "options": {
+        "temperature": 0.1,
+        "num_predict": 800,
+    },
+}
 
-def summarise(text: str) -> dict:
+# (text before notes, text after notes) per language
+_USER_MESSAGE = {
+    "en": (
+        "Here are the appointment notes/transcript:\n\n",
+        "\n\nPlease extract and return the structured JSON summary.",
+    ),
+    "hi": (
+        "नीचे अपॉइंटमेंट के नोट्स/ट्रांसक्रिप्ट हैं:\n\n",
+        "\n\nकृपया JSON सारांश निकालें और वापस करें।",
+    ),
+}
+
+_PROMPT_TAIL = "\n\nAssistant:"
+
+# Request body = _BODY_PREFIX + prompt fragments + b'"}', with every field
+# but the prompt serialised once here
+_BODY_PREFIX = fastjson.dumps(_BASE_PAYLOAD)[:-1].encode() + b',"prompt":"'
+
+
+@lru_cache(maxsize=2)
+def _prompt_parts(lang: str) -> tuple[str, bytes, bytes]:
+    """
+    (system prompt, prompt text before the notes, after them) for `lang`,
+    the latter two already JSON-encoded (see fastjson.fragment).
+    """
+    system_prompt = build_appointment_system_prompt(lang)
+    user_head, user_tail = _USER_MESSAGE[lang]
+    return (
+        system_prompt,
+        fastjson.fragment(f"{system_prompt}\n\nUser: {user_head}"),
+        fastjson.fragment(user_tail + _PROMPT_TAIL),
+    )
+
+
+# ── Summary cache: hash(model, prompt, text) → summary JSON ───────────────────
+SUMMARY_CACHE_SIZE = 512
+_summary_cache: OrderedDict[str, str] = OrderedDict()
+_summary_cache_lock = threading.Lock()  # request threads share it
+
+
+@lru_cache(maxsize=1)
+def _get_http():
+    """
+    Shared keep-alive requests.Session for Ollama calls, created on first use.
+    Reusing it avoids a fresh TCP handshake for every summary.
+    """
+    # Imported lazily, as in rag/pipeline.py — keeps requests off app startup
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    http = requests.Session()
+    http.headers["Connection"] = "keep-alive"
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        ),
+    )
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+
+def _summary_cache_key(system_prompt: str, text: str) -> str:
+    raw = f"{OLLAMA_MODEL}\x00{system_prompt}\x00{text}".encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> dict | None:
+    with _summary_cache_lock:
+        cached = _summary_cache.get(key)
+        if cached is None:
+            return None
+        _summary_cache.move_to_end(key)
+    # Stored as JSON so callers can't mutate the cached copy
+    return fastjson.loads(cached)
+
+
+def _cache_put(key: str, summary: dict):
+    serialised = fastjson.dumps(summary)
+    with _summary_cache_lock:
+        _summary_cache[key] = serialised
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+
+
+def _generate(prompt: bytes) -> str:
+    """
+    Stream a generation from Ollama and return the full response text.
+    Each streamed line is one small JSON object, parsed as it arrives —
+    no buffering the whole body and re-parsing it afterwards.
+    OLLAMA_TIMEOUT still bounds the whole generation, not just each read.
+    `prompt` arrives JSON-encoded, as built from fastjson.fragment pieces.
+    """
+    import requests
+
+    deadline = time.monotonic() + OLLAMA_TIMEOUT
+    parts = []
+    with _get_http().post(
+        f"{OLLAMA_BASE_URL}/api/generate",
+        data=b"".join((_BODY_PREFIX, prompt, b'"}')),
+        headers={"Content-Type": "application/json"},
+        timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT),
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = fastjson.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"])
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                break
+            if time.monotonic() > deadline:
+                raise requests.exceptions.Timeout()
+    return "".join(parts).strip()
+
+
+def summarise(text: str, lang: str | None = None) -> dict:
     """
     Generate structured appointment summary from text.
-    Language is determined from the active Flask session (en or hi).
+    Language is `lang` (en or hi) if given, else the active Flask session's —
+    background workers have no session so they must pass it explicitly.
 
     Returns { success, summary, error } where summary is a parsed dict.
     """
+    import requests
+
     if not text or len(text.strip()) < 10:
         return {
             "success": False,
@@ -29,51 +179,38 @@ def summarise(text: str) -> dict:
             "error": "Text is too short to summarise.",
         }
 
-    from ..lang.helpers import build_appointment_system_prompt, is_hindi
+    if lang is None:
+        lang = get_active_language()
+    system_prompt, prompt_head, prompt_tail = _prompt_parts(
+        "hi" if lang == "hi" else "en"
+    )
 
-    system_prompt = build_appointment_system_prompt()
+    # Re-submitted notes or retries skip the Ollama round-trip entirely
+    cache_key = _summary_cache_key(system_prompt, text)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return {"success": True, "summary": cached, "error": None}
 
-    if is_hindi():
-        user_message = (
-            f"नीचे अपॉइंटमेंट के नोट्स/ट्रांसक्रिप्ट हैं:\n\n{text}\n\n"
-            "कृपया JSON सारांश निकालें और वापस करें।"
-        )
-    else:
-        user_message = (
-            f"Here are the appointment notes/transcript:\n\n{text}\n\n"
-            "Please extract and return the structured JSON summary."
-        )
-
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": f"{system_prompt}\n\nUser: {user_message}\n\nAssistant:",
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-            "num_predict": 800,
-        },
-    }
+    prompt = b"".join((prompt_head, fastjson.fragment(text), prompt_tail))
 
+    raw = ""
     try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json=payload,
-            timeout=OLLAMA_TIMEOUT,
-        )
-        response.raise_for_status()
-        raw = response.json().get("response", "").strip()
+        raw = _generate(prompt)
 
-        # Strip markdown code fences if present
+        # Strip markdown code fences (```json ... ```) if present
         if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
+            raw = raw[3:]
+            if raw[:4].lower() == "json":
                 raw = raw[4:]
+            if raw.endswith("```"):
+                raw = raw[:-3]
         raw = raw.strip()
 
-        summary = json.loads(raw)
+        summary = _parse_summary(raw)
+        _cache_put(cache_key, summary)
         return {"success": True, "summary": summary, "error": None}
 
-    except json.JSONDecodeError:
+    except fastjson.JSONDecodeError:
         return {
             "success": True,
             "summary": _fallback_summary(text, raw),
@@ -95,6 +232,60 @@ def summarise(text: str) -> dict:
         return {"success": False, "summary": None, "error": str(e)}
 
 
+def _parse_summary(raw: str) -> dict:
+    """
+    Parse the model's JSON object, tolerating chatter around it
+    ("Sure! Here is the summary: {...} Hope this helps").
+    Raises fastjson.JSONDecodeError when no object can be recovered.
+    """
+    candidates = [raw]
+    start, end = raw.find("{"), raw.rfind("}")
+    if 0 <= start < end:
+        candidates.append(raw[start : end + 1])
+    span = _largest_balanced_object(raw)
+    if span is not None:
+        candidates.append(raw[span[0] : span[1]])
+
+    for candidate in candidates:
+        try:
+            parsed = fastjson.loads(candidate)
+        except fastjson.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    raise fastjson.JSONDecodeError("No JSON object in model output", raw, 0)
+
+
+def _largest_balanced_object(raw: str) -> tuple[int, int] | None:
+    """
+    Single pass over `raw`, tracking string/escape state and brace depth.
+    Returns (start, end) of the longest top-level {...} span, or None.
+    """
+    best = None
+    depth = 0
+    start = 0
+    in_string = escaped = False
+    for i, ch in enumerate(raw):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0 and (best is None or i + 1 - start > best[1] - best[0]):
+                best = (start, i + 1)
+    return best
+
+
 def _fallback_summary(original_text: str, ollama_raw: str) -> dict:
     """Basic fallback when Ollama doesn't return valid JSON."""
     return {
@@ -108,74 +299,73 @@ def _fallback_summary(original_text: str, ollama_raw: str) -> dict:
     }
 
 
-def extract_actions(summary: dict) -> list[dict]:
+def extract_actions(summary: dict, lang: str | None = None) -> list[dict]:
     """Convert summary_json into a flat list of AppointmentAction dicts."""
-    from ..lang.helpers import is_hindi
+    if lang is None:
+        lang = get_active_language()
 
-    if is_hindi():
+    if lang == "hi":
         seek_medical = "यह होने पर तुरंत चिकित्सा सहायता लें।"
         followup_default = "अनुवर्ती अपॉइंटमेंट"
     else:
         seek_medical = "Seek medical attention if this occurs."
         followup_default = "Follow-up appointment"
 
-    actions: list[dict] = []
-
-    for med in summary.get("medications", []) or []:
-        actions.append(
-            {
-                "action_type": "medication",
-                "description": med.get("name", ""),
-                "detail": (
-                    f"{med.get('dosage', '')} — {med.get('frequency', '')}. "
-                    f"{med.get('notes', '')}"
-                ).strip(" —"),
-                "due_date": None,
-            }
-        )
-
-    for test in summary.get("tests_ordered", []) or []:
-        actions.append(
-            {
-                "action_type": "test",
-                "description": test.get("name", ""),
-                "detail": (
-                    f"{test.get('location', '')} — {test.get('urgency', '')}"
-                ).strip(" —"),
-                "due_date": None,
-            }
-        )
-
-    for lc in summary.get("lifestyle_changes", []) or []:
-        actions.append(
-            {
-                "action_type": "lifestyle",
-                "description": lc.get("description", ""),
-                "detail": None,
-                "due_date": None,
-            }
-        )
-
-    for ws in summary.get("warning_signs", []) or []:
-        actions.append(
-            {
-                "action_type": "warning",
-                "description": ws,
-                "detail": seek_medical,
-                "due_date": None,
-            }
-        )
+    meds = [
+        {
+            "action_type": "medication",
+            "description": med.get("name", ""),
+            "detail": (
+                f"{med.get('dosage', '')} — {med.get('frequency', '')}. "
+                f"{med.get('notes', '')}"
+            ).strip(" —"),
+            "due_date": None,
+        }
+        for med in summary.get("medications") or ()
+    ]
+    tests = [
+        {
+            "action_type": "test",
+            "description": test.get("name", ""),
+            "detail": (
+                f"{test.get('location', '')} — {test.get('urgency', '')}"
+            ).strip(" —"),
+            "due_date": None,
+        }
+        for test in summary.get("tests_ordered") or ()
+    ]
+    lifestyle = [
+        {
+            "action_type": "lifestyle",
+            "description": lc.get("description", ""),
+            "detail": None,
+            "due_date": None,
+        }
+        for lc in summary.get("lifestyle_changes") or ()
+    ]
+    warnings = [
+        {
+            "action_type": "warning",
+            "description": ws,
+            "detail": seek_medical,
+            "due_date": None,
+        }
+        for ws in summary.get("warning_signs") or ()
+    ]
 
     followup_date = summary.get("followup_date")
     followup_inst = summary.get("followup_instructions")
-    if followup_inst or followup_date:
-        actions.append(
+    followup = (
+        [
             {
                 "action_type": "followup",
                 "description": followup_inst or followup_default,
                 "detail": None,
                 "due_date": followup_date,
             }
-        )
+        ]
+        if followup_inst or followup_date
+        else []
+    )
 
-    return actions
+    return meds + tests + lifestyle + warnings + followup
@@ -0,0 +1,148 @@
+"""
+app/appointments/tasks.py
+
+Background processing for appointments.
+Transcription and summarisation take tens of seconds, so the capture
+routes hand them to a small in-process thread pool and redirect straight
+to the detail page, which polls /appointments/<id>/status until done.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import delete
+
+from ..extensions import db
+from ..models import Appointment, AppointmentAction
+from .summariser import extract_actions, summarise
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _age_seconds(iso_ts: str) -> float:
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(iso_ts)).total_seconds()
+
+
+def expire_stale(appt: Appointment) -> bool:
+    """
+    Mark an appointment failed if it has been processing for longer than
+    APPOINTMENT_STALE_SECONDS. Its job died with the process that ran it
+    (restart or deploy mid-transcription), so nothing else will finish it.
+    Appointments are only processed on capture, so created_at is the start.
+    Caller commits. Returns True if the appointment was marked failed.
+    """
+    if appt.status not in ("pending", "transcribing", "summarising"):
+        return False
+    limit = current_app.config.get("APPOINTMENT_STALE_SECONDS", 3600)
+    if _age_seconds(appt.created_at) < limit:
+        return False
+    print(f"[appointments] Appointment {appt.id} stuck in {appt.status}; failing")
+    appt.status = "failed"
+    return True
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="appointments"
+        )
+    return _executor
+
+
+def submit_appointment(app, appt_id: int, lang: str, transcribe: bool = False):
+    """
+    Queue an appointment for processing.
+    With APPOINTMENT_WORKERS = 0 the work runs inline (useful for tests).
+    """
+    workers = app.config.get("APPOINTMENT_WORKERS", 2)
+    if workers <= 0:
+        _run(app, appt_id, lang, transcribe)
+        return
+    _get_executor(workers).submit(_run, app, appt_id, lang, transcribe)
+
+
+def _run(app, appt_id: int, lang: str, transcribe: bool):
+    with app.app_context():
+        try:
+            process_appointment(appt_id, lang, transcribe)
+        except Exception as e:
+            print(f"[appointments] Processing appointment {appt_id} failed: {e}")
+            db.session.rollback()
+            appt = db.session.get(Appointment, appt_id)
+            if appt is not None:
+                appt.status = "failed"
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def process_appointment(appt_id: int, lang: str, transcribe: bool = False):
+    """Transcribe (for audio captures) then summarise one appointment."""
+    appt = db.session.get(Appointment, appt_id)
+    if appt is None:
+        return
+
+    if transcribe:
+        # Whisper's stack only loads for audio captures
+        from .transcriber import transcribe_audio
+
+        t_result = transcribe_audio(appt.audio_path)
+        if not t_result["success"]:
+            print(f"[appointments] Transcription failed: {t_result['error']}")
+            appt.status = "failed"
+            db.session.commit()
+            return
+        # Not committed here — saved with the summary (or the failure) below
+        appt.raw_transcript = t_result["transcript"]
+        appt.status = "summarising"
+
+    ok, err = _process_and_save(appt, appt.raw_transcript or "", lang)
+    if not ok:
+        print(f"[appointments] Summary failed: {err}")
+
+
+def _process_and_save(appt: Appointment, text: str, lang: str):
+    """
+    Run summariser, save actions, update appointment record.
+    Everything pending on `appt` (e.g. a fresh transcript) lands in the
+    single commit here, on success and on summariser failure alike.
+    """
+    result = summarise(text, lang=lang)
+
+    if not result["success"]:
+        appt.status = "failed"
+        db.session.commit()
+        return False, result["error"]
+
+    summary = result["summary"]
+    appt.summary_json = summary
+    appt.followup_date = summary.get("followup_date")
+    appt.status = "done"
+
+    # Replace actions — one DELETE and one batched INSERT
+    now = _utcnow()
+    db.session.execute(
+        delete(AppointmentAction).where(AppointmentAction.appointment_id == appt.id)
+    )
+    db.session.bulk_save_objects(
+        [
+            AppointmentAction(
+                appointment_id=appt.id,
+                action_type=action_data["action_type"],
+                description=action_data["description"],
+                detail=action_data["detail"],
+                due_date=action_data["due_date"],
+                is_completed=0,
+                created_at=now,
+            )
+            for action_data in extract_actions(summary, lang=lang)
+        ]
+    )
+
+    db.session.commit()
+    return True, None
@@ -1,33 +1,171 @@
 """
-Transcription using faster-whisper (local, no API key needed).
-Model downloads ~150MB on first run, cached in ~/.cache/huggingface/
+Transcription using local Whisper models (no API key needed).
+faster-whisper by default; on Apple Silicon whisper.cpp (via pywhispercpp)
+is used when installed, since CTranslate2 has no Metal backend there.
+Models download on first run (~150MB for base), cached under ~/.cache/.
 """
 
+import importlib.util
 import os
+import platform
+import threading
 
 WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL", "base")
 # Options: tiny, base, small, medium, large
 # base = good balance of speed and accuracy (~150MB)
 # small = better accuracy (~500MB)
 
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "auto")
+# auto = whisper.cpp on Apple Silicon if pywhispercpp is installed,
+#        faster-whisper everywhere else
+# Also: faster-whisper, whispercpp
+
+WHISPER_BEAM_SIZE = int(os.environ.get("WHISPER_BEAM_SIZE", "1"))
+# 1 = greedy decoding, roughly half the decode time of beam search (5)
+# for a WER difference consultation audio doesn't need
+
+WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "8"))
+# VAD-split 30 s chunks decoded together; 1 = sequential (old behaviour)
+
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "auto")
+# auto = int8 weights with bfloat16 activations where the CPU supports them
+#        (AVX-512 BF16 / Arm BF16), plain int8 otherwise. CTranslate2 has no
+#        float16 on CPU. Any CTranslate2 compute type can be forced.
+
+WHISPERCPP_MODELS_DIR = os.path.expanduser("~/.cache/whispercpp")
+# Quantised ggml weights: ~2–3× smaller, same encoder speed on NEON
+_WHISPERCPP_QUANTISED = {
+    "tiny": "tiny-q5_1",
+    "base": "base-q5_1",
+    "small": "small-q5_1",
+    "medium": "medium-q5_0",
+}
+
 _whisper_model = None
+_model_lock = threading.Lock()
+_model_ready = threading.Event()
 
 
-def _get_model():
-    global _whisper_model
-    if _whisper_model is None:
-        from faster_whisper import WhisperModel
+class _FasterWhisperBackend:
+    name = "faster-whisper"
+
+    def __init__(self):
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
 
-        print(f"[transcriber] Loading Whisper {WHISPER_MODEL_SIZE} model...")
-        _whisper_model = WhisperModel(
+        # One model per process, shared by every appointment worker thread;
+        # CTranslate2 releases the GIL while it runs
+        self.model = WhisperModel(
             WHISPER_MODEL_SIZE,
             device="cpu",
-            compute_type="int8",  # efficient on CPU / Apple Silicon
+            compute_type=_cpu_compute_type(),
+        )
+        self.pipeline = BatchedInferencePipeline(model=self.model)
+
+    def transcribe(self, audio_path: str):
+        """Return (segments, info) — info has language / language_probability."""
+        options = {
+            "beam_size": WHISPER_BEAM_SIZE,
+            "best_of": 1,
+            "language": None,  # auto-detect language
+            # Silero VAD skips silent stretches before they reach the model
+            "vad_filter": True,
+            "vad_parameters": {"min_silence_duration_ms": 500},
+        }
+        if WHISPER_BATCH_SIZE > 1:
+            return self.pipeline.transcribe(
+                audio_path, batch_size=WHISPER_BATCH_SIZE, **options
+            )
+        return self.model.transcribe(
+            audio_path, condition_on_previous_text=False, **options
+        )
+
+
+class _WhisperCppBackend:
+    """whisper.cpp with Metal (GPU) / Core ML (ANE) on Apple Silicon."""
+
+    name = "whisper.cpp"
+
+    def __init__(self):
+        from pywhispercpp.model import Model
+
+        os.makedirs(WHISPERCPP_MODELS_DIR, exist_ok=True)
+        self.model = Model(
+            _WHISPERCPP_QUANTISED.get(WHISPER_MODEL_SIZE, WHISPER_MODEL_SIZE),
+            models_dir=WHISPERCPP_MODELS_DIR,
+            print_progress=False,
         )
-        print("[transcriber] Whisper model loaded.")
+
+    def transcribe(self, audio_path: str):
+        # whisper.cpp doesn't report detection confidence, so no info
+        return self.model.transcribe(audio_path, language="auto"), None
+
+
+def _cpu_compute_type() -> str:
+    if WHISPER_COMPUTE_TYPE != "auto":
+        return WHISPER_COMPUTE_TYPE
+    import ctranslate2
+
+    supported = ctranslate2.get_supported_compute_types("cpu")
+    return "int8_bfloat16" if "int8_bfloat16" in supported else "int8"
+
+
+def _is_apple_silicon() -> bool:
+    return platform.system() == "Darwin" and platform.machine() == "arm64"
+
+
+def _installed(package: str) -> bool:
+    """Whether `package` is importable, without running its __init__."""
+    return importlib.util.find_spec(package) is not None
+
+
+def _pick_backend():
+    if WHISPER_BACKEND == "whispercpp":
+        return _WhisperCppBackend
+    if WHISPER_BACKEND == "auto" and _is_apple_silicon() and _installed("pywhispercpp"):
+        return _WhisperCppBackend
+    return _FasterWhisperBackend
+
+
+# Installed packages don't change while the process runs — probe once
+_WHISPER_AVAILABLE = _installed(
+    "pywhispercpp" if _pick_backend() is _WhisperCppBackend else "faster_whisper"
+)
+
+
+def _get_model():
+    """
+    Load the model once per process. Concurrent first callers (including
+    the startup warm-up thread) wait on the lock instead of loading twice.
+    """
+    global _whisper_model
+    if not _model_ready.is_set():
+        with _model_lock:
+            if _whisper_model is None:
+                backend = _pick_backend()
+                print(
+                    f"[transcriber] Loading Whisper {WHISPER_MODEL_SIZE} model "
+                    f"({backend.name})..."
+                )
+                _whisper_model = backend()
+                _model_ready.set()
+                print("[transcriber] Whisper model loaded.")
     return _whisper_model
 
 
+def init_app(app):
+    """Start loading the model in the background so the first upload doesn't."""
+    if not app.config.get("WHISPER_PRELOAD") or not whisper_available():
+        return
+    threading.Thread(target=_warm_up, name="whisper-warmup", daemon=True).start()
+
+
+def _warm_up():
+    try:
+        _get_model()
+    except Exception as e:
+        print(f"[transcriber] Warm-up failed: {e}")
+
+
 def transcribe_audio(audio_path: str) -> dict:
     """
     Transcribe an audio file using faster-whisper.
@@ -42,13 +180,10 @@ def transcribe_audio(audio_path: str) -> dict:
 
     try:
         model = _get_model()
-        segments, info = model.transcribe(
-            audio_path,
-            beam_size=5,
-            language=None,  # auto-detect language
-        )
+        segments, info = model.transcribe(audio_path)
 
-        transcript = " ".join(segment.text.strip() for segment in segments).strip()
+        texts = [segment.text for segment in segments]
+        transcript = " ".join(map(str.strip, texts)).strip()
 
         if not transcript:
             return {
@@ -60,10 +195,11 @@ def transcribe_audio(audio_path: str) -> dict:
                 ),
             }
 
-        print(
-            f"[transcriber] Detected language: {info.language} "
-            f"({info.language_probability:.0%} confidence)"
-        )
+        if info is not None:
+            print(
+                f"[transcriber] Detected language: {info.language} "
+                f"({info.language_probability:.0%} confidence)"
+            )
         return {"success": True, "transcript": transcript, "error": None}
 
     except Exception as e:
@@ -72,12 +208,7 @@ def transcribe_audio(audio_path: str) -> dict:
 
 def whisper_available() -> bool:
     """
-    Check if faster-whisper is importable.
+    Check if the Whisper backend we'd load is importable.
     Always True if the package is installed.
     """
-    try:
-        import faster_whisper  # noqa: F401
-
-        return True
-    except ImportError:
-        return False
+    return _WHISPER_AVAILABLE
@@ -2,6 +2,7 @@ from flask_wtf import FlaskForm
 from wtforms import PasswordField, StringField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 
+from ..extensions import db
 from ..models import User
 
 
@@ -31,8 +32,10 @@ class SignupForm(FlaskForm):
     submit = SubmitField("Create Account")
 
     def validate_email(self, field):
-        user = User.query.filter_by(email=field.data.lower().strip()).first()
-        if user:
+        # Existence only — answered from the unique email index
+        email = field.data.strip().lower()
+        taken = db.session.query(User.id).filter_by(email=email).first()
+        if taken:
             raise ValidationError("An account with this email already exists.")
 
 
@@ -1,19 +1,16 @@
-import json
-
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
 
 from ..extensions import db, limiter
 from ..models import AuditLog, User
+from ..user_cache import forget_user
 from .forms import LoginForm, SignupForm
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
 def _log(user_id: int, event: str, detail: dict = None):
-    log = AuditLog(
-        user_id=user_id, event_type=event, event_detail=json.dumps(detail or {})
-    )
+    log = AuditLog(user_id=user_id, event_type=event, event_detail=detail or {})
     db.session.add(log)
     db.session.commit()
 
@@ -39,7 +36,6 @@ def signup():
     return render_template("auth/signup.html", form=form)
 
 
-@auth_bp.route("/login", methods=["GET", "POST"])
 @auth_bp.route("/login", methods=["GET", "POST"])
 @limiter.limit("10 per minute")
 def login():
@@ -49,12 +45,19 @@ def login():
     form = LoginForm()
 
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data.lower().strip()).first()
+        # Stored lower-cased at signup, so an exact match uses ix_users_email
+        email = form.email.data.strip().lower()
+        user = User.query.filter_by(email=email).first()
 
         if user is None or not user.check_password(form.password.data):
             flash("Invalid email or password.", "error")
             return render_template("auth/login.html", form=form)
 
+        # Upgrade hashes made with old parameters while we have the password
+        if user.needs_rehash():
+            user.set_password(form.password.data)
+            forget_user(user.id)
+
         login_user(user)
         _log(user.id, "login")
 
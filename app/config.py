@@ -1,13 +1,71 @@
 import os
 
+from . import fastjson
+
+_BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
 
 class BaseConfig:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-in-prod")
-    UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), "uploads")
+    UPLOAD_FOLDER = os.path.join(_BASE_DIR, "uploads")
+    # Werkzeug rejects bigger requests with 413 from Content-Length, before
+    # any body is spooled. Appointment audio uploads get the larger limit
+    # (@max_content_length, app/request_limits.py).
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB
+    AUDIO_MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
     WTF_CSRF_ENABLED = True
     WTF_CSRF_HEADERS = ["X-CSRFToken"]
 
+    # "argon2" (argon2id, see app/passwords.py) or a werkzeug hash spec with
+    # every parameter spelled out (e.g. "scrypt:32768:8:1") so stored hashes
+    # can be compared against it; older hashes are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "argon2")
+
+    # Background threads for appointment transcription/summarisation.
+    # 0 runs the work inline in the request (handy for tests).
+    APPOINTMENT_WORKERS = int(os.environ.get("APPOINTMENT_WORKERS", "2"))
+    # An appointment still processing after this long lost its worker (the
+    # process restarted) and is marked failed the next time it is looked at.
+    # Generous: Whisper on CPU can take a while over an hour-long recording.
+    APPOINTMENT_STALE_SECONDS = int(
+        os.environ.get("APPOINTMENT_STALE_SECONDS", "3600")
+    )
+
+    # Background threads for pharmacy emails (0 = send inline). Sends share
+    # one SMTP connection, so more than one worker only queues on its lock.
+    EMAIL_WORKERS = int(os.environ.get("EMAIL_WORKERS", "1"))
+    # A send still 'sending' after this long lost its worker and is marked
+    # failed the next time its status is looked at
+    EMAIL_STALE_SECONDS = int(os.environ.get("EMAIL_STALE_SECONDS", "300"))
+
+    # Background threads for report PDF rendering (0 = render inline), and
+    # worker processes those threads hand the ReportLab build to (0 = build
+    # on the thread). Processes let renders use more than one core; off by
+    # default so dev/test/scripts don't spawn them.
+    REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+    REPORT_PROCESSES = int(os.environ.get("REPORT_PROCESSES", "0"))
+    # A report still pending after this long lost its render (the process
+    # restarted) and is marked failed the next time it is looked at
+    REPORT_STALE_SECONDS = int(os.environ.get("REPORT_STALE_SECONDS", "300"))
+
+    # Background threads for FAISS index builds (0 = build inline), and how
+    # long a chat question waits on a build still in flight before replying
+    # "still indexing" instead of holding the request.
+    INDEX_WORKERS = int(os.environ.get("INDEX_WORKERS", "2"))
+    INDEX_WAIT_SECONDS = float(os.environ.get("INDEX_WAIT_SECONDS", "5"))
+
+    # Load the Whisper model at startup (background thread) instead of on
+    # the first audio upload. Off by default so dev/test/scripts stay light.
+    WHISPER_PRELOAD = os.environ.get("WHISPER_PRELOAD", "0") == "1"
+    # Same for the chat embedding model (MiniLM), so each worker's first
+    # chat question doesn't wait for it to load
+    EMBED_PRELOAD = os.environ.get("EMBED_PRELOAD", "0") == "1"
+
+    # Rendered-page cache (Flask-Caching). SimpleCache is per process;
+    # point CACHE_TYPE at RedisCache etc. to share it between workers.
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "SimpleCache")
+    CACHE_DEFAULT_TIMEOUT = 300
+
     # ── Database ───────────────────────────────────────────────────────────
     # Prefer DATABASE_URL from environment (Postgres on Railway/Render/Docker)
     # Fall back to SQLite for local dev without Docker
@@ -22,7 +80,28 @@ class BaseConfig:
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True,  # reconnect on stale connections
         "pool_recycle": 300,  # recycle connections every 5 min
+        # JSON columns (summaries, audit details) go through orjson when present
+        "json_serializer": fastjson.dumps,
+        "json_deserializer": fastjson.loads,
     }
+    if not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        # Request threads plus the appointment/email worker threads all hold
+        # connections; sized per process, keep the total under the server's
+        # max_connections (SQLite's pools don't take a size)
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            {
+                "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+                "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+                "pool_timeout": 10,  # fail fast instead of queueing for 30 s
+                "connect_args": {
+                    # "require" on hosted Postgres; libpq's default otherwise
+                    "sslmode": os.environ.get("DB_SSLMODE", "prefer"),
+                    # Notice dropped connections instead of hanging on them
+                    "keepalives": 1,
+                    "keepalives_idle": 30,
+                },
+            }
+        )
 
 
 class DevelopmentConfig(BaseConfig):
@@ -31,6 +110,9 @@ class DevelopmentConfig(BaseConfig):
 
 class ProductionConfig(BaseConfig):
     DEBUG = False
+    WHISPER_PRELOAD = os.environ.get("WHISPER_PRELOAD", "1") == "1"
+    EMBED_PRELOAD = os.environ.get("EMBED_PRELOAD", "1") == "1"
+    REPORT_PROCESSES = int(os.environ.get("REPORT_PROCESSES", "2"))
 
     # Enforce strong secret key in production
     @classmethod
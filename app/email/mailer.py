@@ -6,11 +6,10 @@ Supports Gmail, Outlook, and any standard SMTP server.
 
 import os
 import smtplib
+import threading
+import time
 from datetime import datetime, timezone
-from email import encoders
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 
 # ── Config from environment ────────────────────────────────────────────────────
 SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
@@ -19,12 +18,66 @@ SMTP_USER = os.environ.get("SMTP_USER", "")
 SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
 SMTP_FROM = os.environ.get("SMTP_FROM", SMTP_USER)
 
+# ── Persistent SMTP connection ─────────────────────────────────────────────────
+# One logged-in connection per process, reused across sends so only the
+# first email pays for TCP + STARTTLS + AUTH. Dropped after sitting idle.
+SMTP_IDLE_TIMEOUT = 60  # seconds
+
+_smtp_lock = threading.Lock()
+_smtp: smtplib.SMTP | None = None
+_smtp_last_used = 0.0
+
 
 def is_configured() -> bool:
     """Return True if SMTP credentials are set in environment."""
     return bool(SMTP_USER and SMTP_PASSWORD)
 
 
+def _connect() -> smtplib.SMTP:
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    server.ehlo()
+    server.starttls()
+    server.login(SMTP_USER, SMTP_PASSWORD)
+    return server
+
+
+def _close(server: smtplib.SMTP):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def _is_alive(server: smtplib.SMTP) -> bool:
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _send(msg: EmailMessage, recipient_email: str):
+    """Send over the shared connection, reconnecting if it went stale."""
+    global _smtp, _smtp_last_used
+    with _smtp_lock:
+        if _smtp is not None and (
+            time.monotonic() - _smtp_last_used > SMTP_IDLE_TIMEOUT
+            or not _is_alive(_smtp)
+        ):
+            _close(_smtp)
+            _smtp = None
+        try:
+            if _smtp is None:
+                _smtp = _connect()
+            _smtp.send_message(msg, from_addr=SMTP_FROM, to_addrs=[recipient_email])
+        except Exception:
+            # Don't reuse a connection in an unknown state
+            if _smtp is not None:
+                _close(_smtp)
+                _smtp = None
+            raise
+        _smtp_last_used = time.monotonic()
+
+
 def send_pharmacy_report(
     recipient_email: str,
     recipient_name: str,
@@ -56,7 +109,7 @@ def send_pharmacy_report(
 
     try:
         # ── Build message ──────────────────────────────────────────────────
-        msg = MIMEMultipart()
+        msg = EmailMessage()
         msg["From"] = f"HealthAssist <{SMTP_FROM}>"
         msg["To"] = f"{recipient_name} <{recipient_email}>"
         msg["Subject"] = f"Informational Health Summary — {session_title}"
@@ -85,25 +138,21 @@ Please find the informational summary attached as a PDF.
 This email was sent via HealthAssist MVP, an informational health tool.
 If you received this in error, please disregard and delete it.
 """
-        msg.attach(MIMEText(body, "plain"))
+        msg.set_content(body)
 
         # ── Attach PDF ─────────────────────────────────────────────────────
+        # Encoded once, straight into the message — no separate MIME part
+        # copy and no full-message str built with as_string()
         with open(pdf_path, "rb") as f:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(f.read())
-
-        encoders.encode_base64(part)
-        part.add_header(
-            "Content-Disposition", 'attachment; filename="pharmacy_summary.pdf"'
-        )
-        msg.attach(part)
+            msg.add_attachment(
+                f.read(),
+                maintype="application",
+                subtype="pdf",
+                filename="pharmacy_summary.pdf",
+            )
 
         # ── Send via SMTP ──────────────────────────────────────────────────
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_FROM, recipient_email, msg.as_string())
+        _send(msg, recipient_email)
 
         return {"success": True, "error": None}
 
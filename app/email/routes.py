@@ -1,14 +1,22 @@
-import json
 from datetime import datetime, timezone
 
-from flask import Blueprint, flash, redirect, render_template, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    url_for,
+)
 from flask_login import current_user, login_required
 
 from ..email.forms import EmailConsentForm
-from ..email.mailer import is_configured, send_pharmacy_report
+from ..email.mailer import is_configured
 from ..extensions import db
 from ..models import AuditLog, Report, Session
 from ..settings.routes import get_pharmacy_settings
+from .tasks import expire_stale_send, submit_email
 
 email_bp = Blueprint("email", __name__, url_prefix="/email")
 
@@ -35,7 +43,7 @@ def _log_audit(user_id, session_id, event, detail):
             user_id=user_id,
             session_id=session_id,
             event_type=event,
-            event_detail=json.dumps(detail),
+            event_detail=detail,
             created_at=_utcnow(),
         )
     )
@@ -53,6 +61,10 @@ def consent_page(report_id):
         flash("Only pharmacy reports can be emailed.", "error")
         return redirect(url_for("reports.report_page", session_id=report.session_id))
 
+    if report.status != "ready":
+        flash("The report PDF isn't ready yet.", "warning")
+        return redirect(url_for("reports.report_page", session_id=report.session_id))
+
     if session.safety_flagged:
         flash("Email sharing is disabled for sessions with safety alerts.", "error")
         return redirect(url_for("reports.report_page", session_id=report.session_id))
@@ -77,46 +89,26 @@ def consent_page(report_id):
                 "consent_note": form.consent_note.data,
             },
         )
+        report.email_status = "sending"
+        report.email_error = None
+        report.email_queued_at = _utcnow()
         db.session.commit()
 
-        result = send_pharmacy_report(
-            recipient_email=pharmacy["pharmacy_email"],
-            recipient_name=pharmacy["pharmacy_name"],
-            sender_name=current_user.email,
-            pdf_path=report.pdf_path,
-            session_title=session.title,
-            consent_note=form.consent_note.data.strip(),
+        # SMTP runs in the background; the sent page polls for the outcome
+        submit_email(
+            current_app._get_current_object(),
+            report.id,
+            current_user.id,
+            {
+                "recipient_email": pharmacy["pharmacy_email"],
+                "recipient_name": pharmacy["pharmacy_name"],
+                "sender_name": current_user.email,
+                "pdf_path": report.pdf_path,
+                "session_title": session.title,
+                "consent_note": form.consent_note.data.strip(),
+            },
         )
-
-        if result["success"]:
-            _log_audit(
-                current_user.id,
-                report.session_id,
-                "email_sent",
-                {
-                    "report_id": report.id,
-                    "recipient_email": pharmacy["pharmacy_email"],
-                },
-            )
-            db.session.commit()
-            return render_template(
-                "email/email_sent.html",
-                session=session,
-                recipient_name=pharmacy["pharmacy_name"],
-                recipient_email=pharmacy["pharmacy_email"],
-            )
-        else:
-            _log_audit(
-                current_user.id,
-                report.session_id,
-                "email_failed",
-                {
-                    "report_id": report.id,
-                    "error": result["error"],
-                },
-            )
-            db.session.commit()
-            flash(f"Email failed: {result['error']}", "error")
+        return redirect(url_for("email.sent_page", report_id=report.id))
 
     return render_template(
         "email/email_consent.html",
@@ -126,3 +118,31 @@ def consent_page(report_id):
         pharmacy=pharmacy,
         smtp_available=smtp_available,
     )
+
+
+@email_bp.route("/<int:report_id>/sent")
+@login_required
+def sent_page(report_id):
+    report = _own_report_or_404(report_id)
+    if report.email_status is None:
+        return redirect(url_for("email.consent_page", report_id=report.id))
+    if expire_stale_send(report):
+        db.session.commit()
+    session = db.session.get(Session, report.session_id)
+    pharmacy = get_pharmacy_settings(current_user.id)
+    return render_template(
+        "email/email_sent.html",
+        report=report,
+        session=session,
+        recipient_name=pharmacy["pharmacy_name"],
+        recipient_email=pharmacy["pharmacy_email"],
+    )
+
+
+@email_bp.route("/<int:report_id>/status")
+@login_required
+def status(report_id):
+    report = _own_report_or_404(report_id)
+    if expire_stale_send(report):
+        db.session.commit()
+    return jsonify({"status": report.email_status, "error": report.email_error})
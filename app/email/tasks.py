@@ -0,0 +1,115 @@
+"""
+app/email/tasks.py
+
+Background delivery of pharmacy report emails.
+SMTP + STARTTLS + the PDF upload can hold a request for seconds, so the
+consent page hands the send to a small in-process thread pool and
+redirects to a status page that polls /email/<id>/status until done.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import AuditLog, Report
+from .mailer import send_pharmacy_report
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def expire_stale_send(report: Report) -> bool:
+    """
+    Mark an email failed if it has been 'sending' for longer than
+    EMAIL_STALE_SECONDS. Its job died with the process that ran it, so
+    nothing else will record an outcome. Rows queued before email_queued_at
+    existed have no timestamp and count as stale.
+    Caller commits. Returns True if the email was marked failed.
+    """
+    if report.email_status != "sending":
+        return False
+    if report.email_queued_at:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(
+            report.email_queued_at
+        )
+        if age.total_seconds() < current_app.config.get("EMAIL_STALE_SECONDS", 300):
+            return False
+    print(f"[email] Report {report.id} stuck sending; failing")
+    report.email_status = "failed"
+    report.email_error = "Sending was interrupted. Please try again."
+    return True
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="email"
+        )
+    return _executor
+
+
+def submit_email(app, report_id: int, user_id: int, send_kwargs: dict):
+    """
+    Queue a report email. `send_kwargs` are send_pharmacy_report's arguments.
+    With EMAIL_WORKERS = 0 the send runs inline (useful for tests).
+    """
+    workers = app.config.get("EMAIL_WORKERS", 1)
+    if workers <= 0:
+        _run(app, report_id, user_id, send_kwargs)
+        return
+    _get_executor(workers).submit(_run, app, report_id, user_id, send_kwargs)
+
+
+def _run(app, report_id: int, user_id: int, send_kwargs: dict):
+    with app.app_context():
+        try:
+            deliver_report(report_id, user_id, send_kwargs)
+        except Exception as e:
+            print(f"[email] Sending report {report_id} failed: {e}")
+            db.session.rollback()
+            report = db.session.get(Report, report_id)
+            if report is not None:
+                report.email_status = "failed"
+                report.email_error = "Unexpected error while sending."
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def deliver_report(report_id: int, user_id: int, send_kwargs: dict):
+    """Send the email, then record the outcome on the report and audit log."""
+    result = send_pharmacy_report(**send_kwargs)
+
+    report = db.session.get(Report, report_id)
+    if report is None:
+        return
+
+    if result["success"]:
+        report.email_status = "sent"
+        report.email_error = None
+        event = "email_sent"
+        detail = {
+            "report_id": report_id,
+            "recipient_email": send_kwargs["recipient_email"],
+        }
+    else:
+        report.email_status = "failed"
+        report.email_error = result["error"]
+        event = "email_failed"
+        detail = {"report_id": report_id, "error": result["error"]}
+
+    db.session.add(
+        AuditLog(
+            user_id=user_id,
+            session_id=report.session_id,
+            event_type=event,
+            event_detail=detail,
+            created_at=_utcnow(),
+        )
+    )
+    db.session.commit()
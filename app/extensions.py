@@ -1,4 +1,5 @@
 from flask_babel import Babel
+from flask_caching import Cache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager
@@ -12,3 +13,4 @@ csrf = CSRFProtect()
 migrate = Migrate()
 limiter = Limiter(key_func=get_remote_address)
 babel = Babel()
+cache = Cache()
@@ -0,0 +1,43 @@
+"""
+JSON helpers for hot serialisation paths (summaries, audit details).
+Uses orjson when it is installed and falls back to the stdlib json module,
+so deployments without the wheel keep working.
+
+orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch
+fastjson.JSONDecodeError (the stdlib class) either way.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(obj, sort_keys: bool = False) -> str:
+    """Serialise to a JSON str (compact when orjson is available)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, sort_keys=sort_keys)
+
+
+def fragment(text: str) -> bytes:
+    """
+    `text` JSON-escaped, without the surrounding quotes, as UTF-8 bytes.
+    Fragments concatenate: b'"' + fragment(a) + fragment(b) + b'"' encodes
+    a + b, so constant parts of a request body can be encoded once.
+    """
+    return dumps(text)[1:-1].encode()
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,31 +1,49 @@
 from flask import Blueprint, render_template
 from flask_login import current_user, login_required
+from sqlalchemy import func, select
 
-from ..models import Session
+from ..extensions import db
+from ..models import ChatMessage, DiseaseResult, Report, Session, Upload
 
 history_bp = Blueprint("history", __name__, url_prefix="/history")
 
 
+def _count_per_session(model):
+    """Correlated COUNT(*) of `model` rows belonging to the outer Session."""
+    return (
+        select(func.count(model.id))
+        .where(model.session_id == Session.id)
+        .correlate(Session)
+        .scalar_subquery()
+    )
+
+
 @history_bp.route("/")
 @login_required
 def history():
-    user_sessions = (
-        Session.query.filter_by(user_id=current_user.id)
+    # Sessions and their summary stats in one query (no per-session COUNTs)
+    rows = (
+        db.session.query(
+            Session,
+            _count_per_session(DiseaseResult),
+            _count_per_session(ChatMessage),
+            _count_per_session(Report),
+            _count_per_session(Upload),
+        )
+        .filter(Session.user_id == current_user.id)
         .order_by(Session.created_at.desc())
         .all()
     )
 
-    # Build summary stats per session
-    session_stats = []
-    for s in user_sessions:
-        session_stats.append(
-            {
-                "session": s,
-                "disease_count": s.disease_results.count(),
-                "message_count": s.chat_messages.count(),
-                "report_count": s.reports.count(),
-                "upload_count": s.uploads.count(),
-            }
-        )
+    session_stats = [
+        {
+            "session": s,
+            "disease_count": disease_count,
+            "message_count": message_count,
+            "report_count": report_count,
+            "upload_count": upload_count,
+        }
+        for s, disease_count, message_count, report_count, upload_count in rows
+    ]
 
     return render_template("history/history.html", session_stats=session_stats)
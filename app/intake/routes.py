@@ -11,6 +11,8 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
 
 from ..extensions import db
 from ..models import ExtractedChunk, IntakeField, Session, Upload
@@ -31,22 +33,30 @@ def _own_session_or_404(session_id: int) -> Session:
     return s
 
 
-def _upsert_intake_field(session_id: int, field_name: str, field_value: str):
-    """Insert or update a single intake field row."""
-    existing = IntakeField.query.filter_by(
-        session_id=session_id, field_name=field_name
-    ).first()
-    if existing:
-        existing.field_value = field_value
-    else:
-        db.session.add(
-            IntakeField(
-                session_id=session_id,
-                field_name=field_name,
-                field_value=field_value,
-                created_at=_utcnow(),
-            )
+def _upsert_intake_fields(session_id: int, fields: dict):
+    """
+    Insert or update all intake field rows in one statement
+    (INSERT ... ON CONFLICT (session_id, field_name) DO UPDATE).
+    """
+    dialect = postgresql if db.engine.dialect.name == "postgresql" else sqlite
+    now = _utcnow()
+    stmt = dialect.insert(IntakeField).values(
+        [
+            {
+                "session_id": session_id,
+                "field_name": name,
+                "field_value": value,
+                "created_at": now,
+            }
+            for name, value in fields.items()
+        ]
+    )
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["session_id", "field_name"],
+            set_={"field_value": stmt.excluded.field_value},
         )
+    )
 
 
 # ── Intake form ────────────────────────────────────────────────────────────────
@@ -79,8 +89,7 @@ def intake_form(session_id):
             "allergies": (form.allergies.data or "").strip(),
             "additional_notes": (form.additional_notes.data or "").strip(),
         }
-        for name, value in fields.items():
-            _upsert_intake_field(session_id, name, value)
+        _upsert_intake_fields(session_id, fields)
 
         # ── Safety check on intake ─────────────────────────────────────────
         from ..safety.triage import check_intake_safety
@@ -119,20 +128,26 @@ def intake_form(session_id):
                 db.session.flush()  # get upload_obj.id before commit
 
                 # ── Extract and chunk ──────────────────────────────────────
-                chunks = extract_and_chunk(file_info["stored_path"])
+                # From the bytes already in memory — no re-reading the file
+                chunks = extract_and_chunk(file_info["data"])
 
                 if chunks:
-                    for i, chunk_text in enumerate(chunks):
-                        db.session.add(
-                            ExtractedChunk(
-                                upload_id=upload_obj.id,
-                                session_id=session_id,
-                                chunk_index=i,
-                                chunk_text=chunk_text,
-                                is_confirmed=0,
-                                created_at=_utcnow(),
-                            )
-                        )
+                    # One executemany INSERT for all chunks
+                    now = _utcnow()
+                    db.session.execute(
+                        insert(ExtractedChunk),
+                        [
+                            {
+                                "upload_id": upload_obj.id,
+                                "session_id": session_id,
+                                "chunk_index": i,
+                                "chunk_text": chunk_text,
+                                "is_confirmed": 0,
+                                "created_at": now,
+                            }
+                            for i, chunk_text in enumerate(chunks)
+                        ],
+                    )
                     upload_obj.upload_status = "extracted"
                     s.status = "reviewing"
                     flash(
@@ -8,13 +8,19 @@ regardless of what language the user typed in.
 Usage:
     from ..lang.helpers import is_hindi, build_rag_prompt, build_appointment_system_prompt
 """
-from flask import session
+from flask import g, session
 
 
 def get_active_language() -> str:
-    """Return 'en' or 'hi' from session. Default: 'en'."""
-    lang = session.get("lang", "en")
-    return lang if lang in ("en", "hi") else "en"
+    """
+    Return 'en' or 'hi' from session. Default: 'en'.
+    Resolved once per request and kept on `g` — Babel's locale selector,
+    the template globals and the prompt builders all ask for it.
+    """
+    if "lang" not in g:
+        lang = session.get("lang", "en")
+        g.lang = lang if lang in ("en", "hi") else "en"
+    return g.lang
 
 
 def is_hindi() -> bool:
@@ -113,6 +119,11 @@ _APPT_PROMPT_EN = (
 )
 
 
-def build_appointment_system_prompt() -> str:
-    """Return appointment summariser system prompt in the active language."""
-    return _APPT_PROMPT_HI if is_hindi() else _APPT_PROMPT_EN
+def build_appointment_system_prompt(lang: str | None = None) -> str:
+    """
+    Return appointment summariser system prompt for `lang`.
+    Defaults to the active session language when called inside a request.
+    """
+    if lang is None:
+        lang = get_active_language()
+    return _APPT_PROMPT_HI if lang == "hi" else _APPT_PROMPT_EN
@@ -1,8 +1,22 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, session
+from flask_login import current_user
+
+from ..extensions import cache
+from ..lang.helpers import get_active_language
 
 main_bp = Blueprint("main", __name__)
 
 
+def _landing_cache_key() -> str:
+    return f"view/landing/{get_active_language()}"
+
+
+def _skip_landing_cache() -> bool:
+    # The nav shows a signed-in user's email, and flashes are per visitor
+    return current_user.is_authenticated or bool(session.get("_flashes"))
+
+
 @main_bp.route("/")
+@cache.cached(timeout=60, key_prefix=_landing_cache_key, unless=_skip_landing_cache)
 def landing():
     return render_template("main/landing.html")
@@ -1,8 +1,8 @@
 from datetime import datetime, timezone
 
 from flask_login import UserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from . import passwords
 from .extensions import db
 
 
@@ -28,10 +28,14 @@ class User(UserMixin, db.Model):
     )
 
     def set_password(self, password: str):
-        self.pw_hash = generate_password_hash(password)
+        self.pw_hash = passwords.hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.pw_hash, password)
+        return passwords.verify_password(self.pw_hash, password)
+
+    def needs_rehash(self) -> bool:
+        """True if the stored hash uses different parameters than configured."""
+        return passwords.needs_rehash(self.pw_hash)
 
     def __repr__(self):
         return f"<User {self.email}>"
@@ -66,6 +70,12 @@ class Session(db.Model):
         "Report", backref="session", lazy="dynamic", cascade="all, delete-orphan"
     )
 
+    # Dashboard and history list a user's sessions newest first.
+    # Timestamps are UTC ISO-8601 text, which sorts chronologically.
+    __table_args__ = (
+        db.Index("ix_sessions_user_created", "user_id", db.text("created_at DESC")),
+    )
+
 
 class IntakeField(db.Model):
     __tablename__ = "intake_fields"
@@ -78,7 +88,10 @@ class IntakeField(db.Model):
     field_value = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.Text, nullable=False, default=utcnow)
 
-    __table_args__ = (db.UniqueConstraint("session_id", "field_name"),)
+    # Target of the intake upsert's ON CONFLICT (intake/routes.py)
+    __table_args__ = (
+        db.Index("uq_intake_session_field", "session_id", "field_name", unique=True),
+    )
 
 
 class Upload(db.Model):
@@ -121,6 +134,13 @@ class ExtractedChunk(db.Model):
         "RagRetrieval", backref="chunk", lazy="dynamic", cascade="all, delete-orphan"
     )
 
+    # Chunks are always read per session in chunk order
+    __table_args__ = (
+        db.Index(
+            "ix_chunk_session_confirmed", "session_id", "is_confirmed", "chunk_index"
+        ),
+    )
+
 
 class DiseaseCatalog(db.Model):
     __tablename__ = "disease_catalog"
@@ -147,7 +167,7 @@ class DiseaseResult(db.Model):
     )
     rank = db.Column(db.Integer, nullable=False)
     similarity_score = db.Column(db.Float, nullable=False)
-    explanation_json = db.Column(db.Text, nullable=True)
+    explanation_json = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.Text, nullable=False, default=utcnow)
 
     __table_args__ = (db.UniqueConstraint("session_id", "rank"),)
@@ -173,6 +193,11 @@ class ChatMessage(db.Model):
         cascade="all, delete-orphan",
     )
 
+    # Chat history is always read per session in time order
+    __table_args__ = (
+        db.Index("ix_chat_session_created", "session_id", "created_at"),
+    )
+
 
 class RagRetrieval(db.Model):
     __tablename__ = "rag_retrievals"
@@ -198,8 +223,18 @@ class Report(db.Model):
     )
     report_type = db.Column(db.Text, nullable=False)
     content_json = db.Column(db.Text, nullable=False)
+    # reports/context.context_hash — unchanged reports aren't re-rendered
+    content_hash = db.Column(db.Text, nullable=True)
     pdf_path = db.Column(db.Text, nullable=True)
     generated_at = db.Column(db.Text, nullable=False, default=utcnow)
+    # PDF render (reports/tasks.py): pending → ready | failed
+    status = db.Column(db.Text, nullable=False, default="pending")
+    # Pharmacy email delivery: None → sending → sent | failed
+    email_status = db.Column(db.Text, nullable=True)
+    email_error = db.Column(db.Text, nullable=True)
+    # When the current send was queued — a 'sending' row that outlives
+    # EMAIL_STALE_SECONDS lost its worker (email/tasks.expire_stale_send)
+    email_queued_at = db.Column(db.Text, nullable=True)
 
 
 class AuditLog(db.Model):
@@ -211,7 +246,7 @@ class AuditLog(db.Model):
     )
     session_id = db.Column(db.Integer, nullable=True)
     event_type = db.Column(db.Text, nullable=False, index=True)
-    event_detail = db.Column(db.Text, nullable=True)
+    event_detail = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.Text, nullable=False, default=utcnow)
 
 
@@ -231,11 +266,17 @@ class Appointment(db.Model):
     capture_method = db.Column(db.Text, nullable=True)
     audio_path = db.Column(db.Text, nullable=True)
     raw_transcript = db.Column(db.Text, nullable=True)
-    summary_json = db.Column(db.Text, nullable=True)
+    summary_json = db.Column(db.JSON, nullable=True)
     followup_date = db.Column(db.Text, nullable=True)
     status = db.Column(db.Text, nullable=False, default="pending")
     created_at = db.Column(db.Text, nullable=False, default=utcnow)
 
+    # Covers the per-session list, newest first
+    __table_args__ = (
+        db.Index("ix_appt_session_created", "session_id", "created_at"),
+    )
+
+    session = db.relationship("Session")
     actions = db.relationship(
         "AppointmentAction",
         backref="appointment",
@@ -257,4 +298,8 @@ class AppointmentAction(db.Model):
     due_date = db.Column(db.Text, nullable=True)
     is_completed = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.Text, nullable=False, default=utcnow)
-    
\ No newline at end of file
+
+    # Actions are always read per appointment, grouped by type
+    __table_args__ = (
+        db.Index("ix_action_appt_type", "appointment_id", "action_type"),
+    )
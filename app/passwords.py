@@ -0,0 +1,62 @@
+"""
+Password hashing for User.
+PASSWORD_HASH_METHOD is either "argon2" (argon2id via argon2-cffi) or a
+werkzeug method spec. Hashes of either kind verify whatever is configured,
+so switching is a config change — old hashes are upgraded on next login.
+Without the argon2-cffi wheel, "argon2" falls back to werkzeug's scrypt.
+"""
+
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:
+    PasswordHasher = None
+
+ARGON2 = "argon2"
+_ARGON2_PREFIX = "$argon2"
+_FALLBACK_METHOD = "scrypt:32768:8:1"
+
+
+@lru_cache(maxsize=1)
+def _argon2():
+    return PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+
+
+def _method() -> str:
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    if method == ARGON2 and PasswordHasher is None:
+        return _FALLBACK_METHOD
+    return method
+
+
+def hash_password(password: str) -> str:
+    method = _method()
+    if method == ARGON2:
+        return _argon2().hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(pw_hash: str, password: str) -> bool:
+    if not pw_hash.startswith(_ARGON2_PREFIX):
+        return check_password_hash(pw_hash, password)
+    if PasswordHasher is None:
+        return False
+    try:
+        return _argon2().verify(pw_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    """True if the stored hash uses a different scheme or parameters than configured."""
+    method = _method()
+    if method == ARGON2:
+        return not pw_hash.startswith(_ARGON2_PREFIX) or _argon2().check_needs_rehash(
+            pw_hash
+        )
+    return not pw_hash.startswith(method + "$")
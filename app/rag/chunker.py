@@ -4,9 +4,13 @@ Reuses extractor logic but exposed separately so
 the RAG pipeline can chunk any text, not just uploads.
 """
 
+import re
+
 CHUNK_SIZE = 400
 CHUNK_OVERLAP = 80
 
+_WORD_RE = re.compile(r"\S+")
+
 
 def chunk_text(
     text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP
@@ -14,21 +18,24 @@ def chunk_text(
     """
     Split text into overlapping word-based chunks.
     Returns list of chunk strings.
+
+    Chunks are slices of `text` between word offsets found in one regex
+    pass, so whitespace inside a chunk is kept as in the source rather
+    than re-joined with single spaces.
     """
-    if not text or not text.strip():
+    if not text:
         return []
 
-    words = text.split()
-    if not words:
+    spans = [m.span() for m in _WORD_RE.finditer(text)]
+    if not spans:
         return []
 
     chunks = []
     start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        if end >= len(words):
+    while start < len(spans):
+        end = min(start + chunk_size, len(spans))
+        chunks.append(text[spans[start][0] : spans[end - 1][1]])
+        if end >= len(spans):
             break
         start += chunk_size - overlap
 
@@ -10,16 +10,40 @@ Flow:
   6. Return answer with citations
 """
 
+import hashlib
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
 
-import requests
+from flask import has_app_context
 
+from .. import fastjson
+from ..extensions import cache
 from ..safety.triage import check_safety, is_retrieval_sufficient
-from .vector_store import build_session_index, retrieve_chunks, session_index_exists
+from .tasks import wait_for_index
+from .vector_store import (
+    embed_query,
+    find_similar_answer,
+    remember_answer,
+    RetrievalResult,
+    retrieve_chunks,
+)
 
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
 OLLAMA_TIMEOUT = int(os.environ.get("OLLAMA_TIMEOUT", "60"))
+# Ollama is local, so a connection that takes longer than this means it's down
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "2"))
+# How long Ollama keeps the model loaded after a request (its default is 5m,
+# after which the next question pays a multi-second reload)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Context window, set explicitly: fits the system prompt, five chunks (Hindi
+# tokenises long) and the answer, so Ollama never truncates the prompt head
+# and its cached system-prompt prefix stays valid between turns
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "4096"))
 
 
 # ── Language-aware system prompts ──────────────────────────────────────────────
@@ -79,9 +103,75 @@ NO_DOCS_HI = (
     "कृपया पहले एक PDF अपलोड करें और निकाले गए पाठ की पुष्टि करें।"
 )
 
+INDEXING_EN = (
+    "Your documents are still being prepared for search. "
+    "Please ask again in a moment."
+)
+
+INDEXING_HI = (
+    "आपके दस्तावेज़ अभी खोज के लिए तैयार किए जा रहे हैं। "
+    "कृपया थोड़ी देर में फिर से पूछें।"
+)
+
+
+# Questions with fewer words than this get the don't-know reply up front
+MIN_QUESTION_WORDS = 2
+_WORD_RE = re.compile(r"\S*\w\S*")  # a word: a token with a letter/digit
+
+
+_SYSTEM_PROMPTS = {"en": SYSTEM_PROMPT_EN, "hi": SYSTEM_PROMPT_HI}
+
+# User message = head + context + middle + question + tail, per language.
+# Everything but the context and question is fixed, so it's joined once here.
+_USER_PARTS = {
+    "en": (
+        "Here are the relevant chunks from the patient's documents:\n\n",
+        "\n\nPatient's question: ",
+        "\n\nAnswer using ONLY the chunks above. "
+        "Use [1], [2], [3] to cite your sources.",
+    ),
+    "hi": (
+        "नीचे मरीज के दस्तावेज़ों के प्रासंगिक खंड हैं:\n\n",
+        "\n\nमरीज का प्रश्न: ",
+        "\n\nकेवल ऊपर दिए गए खंडों का उपयोग करके उत्तर दें। "
+        "अपने स्रोतों को उद्धृत करने के लिए [1], [2], [3] का उपयोग करें।",
+    ),
+}
+
+
+# /api/chat request body = prefix + user message fragments + b'"}]}'. The
+# prefix carries every field up to the user message's content — including
+# the system message, byte-identical every turn so Ollama reuses its cached
+# KV for that prefix — serialised once per (stream mode, language).
+_BODY_PREFIX = {
+    (stream, lang): fastjson.dumps(
+        {
+            "model": OLLAMA_MODEL,
+            "stream": stream,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": 0.1,
+                "num_predict": 400,
+                "num_ctx": OLLAMA_NUM_CTX,
+            },
+        }
+    )[:-1].encode()
+    + b',"messages":[{"role":"system","content":"'
+    + fastjson.fragment(system_prompt)
+    + b'"},{"role":"user","content":"'
+    for stream in (False, True)
+    for lang, system_prompt in _SYSTEM_PROMPTS.items()
+}
+_USER_FRAGMENTS = {
+    lang: tuple(map(fastjson.fragment, parts)) for lang, parts in _USER_PARTS.items()
+}
+
 
 def _get_prompts():
-    """Return (system_prompt, dont_know, no_docs, user_message_prefix) for active lang."""
+    """
+    Return (dont_know, no_docs, lang) for the active language.
+    The system prompts are already encoded into _BODY_PREFIX.
+    """
     try:
         from ..lang.helpers import is_hindi
         hindi = is_hindi()
@@ -90,122 +180,259 @@ def _get_prompts():
         hindi = False
 
     if hindi:
-        return SYSTEM_PROMPT_HI, DONT_KNOW_HI, NO_DOCS_HI, "hi"
-    return SYSTEM_PROMPT_EN, DONT_KNOW_EN, NO_DOCS_EN, "en"
+        return DONT_KNOW_HI, NO_DOCS_HI, "hi"
+    return DONT_KNOW_EN, NO_DOCS_EN, "en"
+
+
+# ── Answer cache: hash(model, session, lang, question, chunks) → answer ───────
+# Kept in-process, and also in the app's Flask-Caching backend so that with a
+# shared one (CACHE_TYPE=RedisCache) every worker sees every cached answer
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 3600  # seconds, shared backend only
+_answer_cache: OrderedDict[str, str] = OrderedDict()
+_answer_cache_lock = threading.Lock()  # request threads share it
+
+
+def _answer_cache_key(
+    session_id: int, lang: str, question: str, retrieved: list[RetrievalResult]
+) -> str:
+    """Re-asking the same question over the same retrieved text hits the cache."""
+    h = hashlib.blake2b(digest_size=16)
+    normalized = " ".join(question.lower().split())
+    for part in (OLLAMA_MODEL, str(session_id), lang, normalized):
+        h.update(part.encode())
+        h.update(b"\x00")
+    for result in retrieved:
+        # Only this much of each chunk reaches the prompt
+        h.update(result.prompt_text.encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _answer_cache_get(key: str) -> str | None:
+    with _answer_cache_lock:
+        answer = _answer_cache.get(key)
+        if answer is not None:
+            _answer_cache.move_to_end(key)
+            return answer
+    if has_app_context():
+        answer = cache.get(f"rag/answer/{key}")
+        if answer is not None:
+            _answer_cache_put(key, answer, shared=False)
+    return answer
+
+
+def _answer_cache_put(key: str, answer: str, shared: bool = True):
+    with _answer_cache_lock:
+        _answer_cache[key] = answer
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+    if shared and has_app_context():
+        cache.set(f"rag/answer/{key}", answer, timeout=ANSWER_CACHE_TTL)
 
 
 # ── Ollama caller ──────────────────────────────────────────────────────────────
 
 
-def _call_ollama(question: str, retrieved: list[dict]) -> str:
+@lru_cache(maxsize=1)
+def _get_http():
     """
-    Send the question + retrieved chunks to Ollama and get a synthesized answer.
-    Prompt language matches the active Flask session language.
+    Shared keep-alive requests.Session for Ollama calls, created on first use.
+    Chat turns reuse pooled connections instead of reconnecting each time;
+    requests.Session is safe to share across Flask's request threads.
     """
-    system_prompt, dont_know, no_docs, lang = _get_prompts()
+    # Imported lazily — requests drags in urllib3, certifi and ssl, which
+    # app startup (and every page that never asks a question) can skip.
+    import requests
+    from requests.adapters import HTTPAdapter
 
-    # Build numbered context
-    context_parts = []
-    for i, result in enumerate(retrieved):
-        context_parts.append(f"[{i + 1}] {result['text'][:600]}")
-    context = "\n\n".join(context_parts)
-
-    if lang == "hi":
-        user_message = (
-            "नीचे मरीज के दस्तावेज़ों के प्रासंगिक खंड हैं:\n\n"
-            f"{context}\n\n"
-            f"मरीज का प्रश्न: {question}\n\n"
-            "केवल ऊपर दिए गए खंडों का उपयोग करके उत्तर दें। "
-            "अपने स्रोतों को उद्धृत करने के लिए [1], [2], [3] का उपयोग करें।"
-        )
-    else:
-        user_message = (
-            "Here are the relevant chunks from the patient's documents:\n\n"
-            f"{context}\n\n"
-            f"Patient's question: {question}\n\n"
-            "Answer using ONLY the chunks above. "
-            "Use [1], [2], [3] to cite your sources."
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+
+def _build_body(
+    question: str, retrieved: list[RetrievalResult], lang: str, stream: bool
+) -> bytes:
+    """
+    Ollama /api/chat JSON body for the question + retrieved chunks,
+    prompting in `lang`. Only the context and question are encoded per call.
+    """
+    head, middle, tail = _USER_FRAGMENTS[lang]
+
+    context = "\n\n".join(
+        f"[{i + 1}] {result.prompt_text}" for i, result in enumerate(retrieved)
+    )
+
+    return b"".join(
+        (
+            _BODY_PREFIX[stream, lang],
+            head,
+            fastjson.fragment(context),
+            middle,
+            fastjson.fragment(question),
+            tail,
+            b'"}]}',
         )
+    )
 
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": f"{system_prompt}\n\nUser: {user_message}\n\nAssistant:",
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-            "num_predict": 400,
-        },
-    }
+
+def _call_ollama(
+    question: str, retrieved: list[RetrievalResult], lang: str, on_answer=None
+) -> str:
+    """
+    Send the question + retrieved chunks to Ollama and get a synthesized answer.
+    Prompt (and fallback) language is `lang`, resolved once by run_rag.
+    Real answers (not fallbacks) are passed to `on_answer` for caching.
+    """
+    import requests
+
+    body = _build_body(question, retrieved, lang, stream=False)
 
     try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json=payload,
-            timeout=OLLAMA_TIMEOUT,
+        response = _get_http().post(
+            f"{OLLAMA_BASE_URL}/api/chat",
+            data=body,
+            headers={"Content-Type": "application/json"},
+            timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT),
         )
         response.raise_for_status()
-        data = response.json()
-        answer = data.get("response", "").strip()
+        data = fastjson.loads(response.content)
+        answer = data.get("message", {}).get("content", "").strip()
 
         if not answer:
-            return _fallback_answer(retrieved)
+            return _fallback_answer(retrieved, lang)
 
+        if on_answer is not None:
+            on_answer(answer)
         return answer
 
     except requests.exceptions.ConnectionError:
         print("[RAG] Ollama not running. Start with: ollama serve")
-        return _fallback_answer(retrieved)
+        return _fallback_answer(retrieved, lang)
 
     except requests.exceptions.Timeout:
         print(f"[RAG] Ollama timed out after {OLLAMA_TIMEOUT}s.")
-        return _fallback_answer(retrieved)
+        return _fallback_answer(retrieved, lang)
 
     except Exception as e:
         print(f"[RAG] Ollama error: {e}")
-        return _fallback_answer(retrieved)
+        return _fallback_answer(retrieved, lang)
 
 
-# ── Fallback when Ollama is offline ───────────────────────────────────────────
+def _call_ollama_stream(
+    question: str, retrieved: list[RetrievalResult], lang: str, on_answer=None
+):
+    """
+    Streaming variant of _call_ollama: returns an iterator of answer text
+    pieces as Ollama generates them, so the first words reach the user
+    before the rest exist. If Ollama fails before producing anything,
+    the iterator yields the fallback answer instead.
+    """
+    # Built now, not on first iteration; the fallback only if it's needed
+    body = _build_body(question, retrieved, lang, stream=True)
+    return _stream_generate(body, retrieved, lang, on_answer)
 
 
-def _fallback_answer(retrieved: list[dict]) -> str:
-    """Structured extraction fallback — no LLM needed."""
-    LAB_KEYWORDS = {
-        "NORMAL", "HIGH", "LOW", "RESULT", "SODIUM", "POTASSIUM", "GLUCOSE",
-        "HEMOGLOBIN", "CREATININE", "CHOLESTEROL", "PHYSICIAN", "DATE",
-        "COLLECTED", "REPORTED", "PATIENT", "SPECIMEN", "WBC", "RBC",
-        "PLATELET", "CALCIUM", "PROTEIN",
-    }
+def _stream_generate(
+    body: bytes, retrieved: list[RetrievalResult], lang: str, on_answer
+):
+    import requests
+
+    pieces = []
 
     try:
-        from ..lang.helpers import is_hindi
-        hindi = is_hindi()
-    except RuntimeError:
-        hindi = False
+        with _get_http().post(
+            f"{OLLAMA_BASE_URL}/api/chat",
+            data=body,
+            headers={"Content-Type": "application/json"},
+            timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT),
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = fastjson.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                piece = chunk.get("message", {}).get("content", "")
+                if piece:
+                    # Leading whitespace is dropped, as .strip() does for _call_ollama
+                    if not pieces:
+                        piece = piece.lstrip()
+                    if piece:
+                        pieces.append(piece)
+                        yield piece
+                if chunk.get("done"):
+                    # Only complete generations are cached
+                    if pieces and on_answer is not None:
+                        on_answer("".join(pieces).strip())
+                    break
+
+    except requests.exceptions.ConnectionError:
+        print("[RAG] Ollama not running. Start with: ollama serve")
+    except requests.exceptions.Timeout:
+        print(f"[RAG] Ollama timed out after {OLLAMA_TIMEOUT}s.")
+    except Exception as e:
+        print(f"[RAG] Ollama error: {e}")
+
+    if not pieces:
+        yield _fallback_answer(retrieved, lang)
+
+
+# ── Fallback when Ollama is offline ───────────────────────────────────────────
+
+# Each line (whitespace-stripped, as group 1) containing a lab keyword.
+# Substring match, so "RESULTS" counts too.
+_LAB_LINE_RE = re.compile(
+    r"^[^\S\n]*([^\n]*?(?:"
+    "NORMAL|HIGH|LOW|RESULT|SODIUM|POTASSIUM|GLUCOSE|HEMOGLOBIN|CREATININE|"
+    "CHOLESTEROL|PHYSICIAN|DATE|COLLECTED|REPORTED|PATIENT|SPECIMEN|WBC|RBC|"
+    "PLATELET|CALCIUM|PROTEIN"
+    r")[^\n]*?)[^\S\n]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def _fallback_answer(retrieved: list[RetrievalResult], lang: str) -> str:
+    """Structured extraction fallback — no LLM needed."""
+    hindi = lang == "hi"
 
     lines = []
     for i, result in enumerate(retrieved[:3]):
         meaningful = []
-        for line in result["text"].split("\n"):
-            line = line.strip()
-            if len(line) > 10 and any(kw in line.upper() for kw in LAB_KEYWORDS):
+        for match in _LAB_LINE_RE.finditer(result.text):
+            line = match.group(1)
+            if len(line) > 10:
                 meaningful.append(line)
+                if len(meaningful) == 4:
+                    break  # only four are shown; skip the rest of the chunk
         if meaningful:
-            lines.append(f"[{i + 1}] " + " | ".join(meaningful[:4]))
+            lines.append(f"[{i + 1}] " + " | ".join(meaningful))
 
     if hindi:
-        disclaimer = "\n\n⚕ यह केवल सूचनात्मक है। कृपया अपने स्वास्थ्य सेवा प्रदाता से परामर्श लें।"
+        disclaimer = (
+            "\n\n⚕ यह केवल सूचनात्मक है। "
+            "कृपया अपने स्वास्थ्य सेवा प्रदाता से परामर्श लें।"
+        )
         prefix = "आपके दस्तावेज़ों से:\n\n"
         fallback_prefix = "आपके दस्तावेज़ों से [1]: "
     else:
-        disclaimer = "\n\n⚕ This is informational only. Please consult your healthcare provider."
+        disclaimer = (
+            "\n\n⚕ This is informational only. "
+            "Please consult your healthcare provider."
+        )
         prefix = "From your documents:\n\n"
         fallback_prefix = "From your documents [1]: "
 
     if lines:
         return prefix + "\n".join(lines) + disclaimer
 
-    top = retrieved[0]["text"][:300] if retrieved else ""
+    top = retrieved[0].excerpt if retrieved else ""
     return f"{fallback_prefix}{top}...{disclaimer}"
 
 
@@ -213,9 +440,11 @@ def _fallback_answer(retrieved: list[dict]) -> str:
 
 
 def ensure_index(session_id: int, chunks: list[str]) -> bool:
-    if session_index_exists(session_id):
-        return True
-    return build_session_index(session_id, chunks)
+    """
+    True once the session's index is ready. Cold sessions are built in the
+    background (rag/tasks.py); False if that takes longer than the wait.
+    """
+    return wait_for_index(session_id, chunks)
 
 
 # ── Main RAG entry point ───────────────────────────────────────────────────────
@@ -229,6 +458,9 @@ def run_rag(
     source_names: list[str],
     use_private_only: bool = True,
     top_n: int = 5,
+    stream: bool = False,
+    bypass_cache: bool = False,
+    q_vec=None,
 ) -> dict:
     """
     Full RAG pipeline for one user question.
@@ -238,8 +470,40 @@ def run_rag(
         answer, citations, safety_triggered,
         emergency_message, retrieved
     }
+    With stream=True, answer is an iterator of text pieces instead of a str
+    (a single piece for cached and canned safety / no-docs / don't-know answers).
+    bypass_cache=True skips the answer cache lookups (regenerate); the fresh
+    answer is still cached. q_vec is the question's embed_query() vector, or
+    a Future of it, if the caller started that early.
     """
-    _, dont_know, no_docs, lang = _get_prompts()
+    result = _run_rag(
+        session_id,
+        question,
+        chunks,
+        chunk_db_ids,
+        source_names,
+        top_n,
+        stream,
+        bypass_cache,
+        q_vec,
+    )
+    if stream and isinstance(result["answer"], str):
+        result["answer"] = iter((result["answer"],))
+    return result
+
+
+def _run_rag(
+    session_id: int,
+    question: str,
+    chunks: list[str],
+    chunk_db_ids: list[int],
+    source_names: list[str],
+    top_n: int,
+    stream: bool,
+    bypass_cache: bool,
+    q_vec,
+) -> dict:
+    dont_know, no_docs, lang = _get_prompts()
 
     # ── 1. Safety check ────────────────────────────────────────────────────
     safety = check_safety(question)
@@ -275,10 +539,33 @@ def run_rag(
             "retrieved": [],
         }
 
-    ensure_index(session_id, chunks)
+    # A bare word ("hi", "ok", "?") can't be answered from the documents —
+    # say so without paying for an index build and a query embedding
+    if len(_WORD_RE.findall(question)) < MIN_QUESTION_WORDS:
+        return {
+            "answer": dont_know,
+            "citations": [],
+            "safety_triggered": False,
+            "emergency_message": None,
+            "retrieved": [],
+        }
+
+    if not ensure_index(session_id, chunks):
+        return {
+            "answer": INDEXING_HI if lang == "hi" else INDEXING_EN,
+            "citations": [],
+            "safety_triggered": False,
+            "emergency_message": None,
+            "retrieved": [],
+        }
 
     # ── 3. Retrieve top-N chunks ───────────────────────────────────────────
-    retrieved = retrieve_chunks(session_id, question, top_n=top_n)
+    # The embedding also keys the semantic answer cache
+    if q_vec is None:
+        q_vec = embed_query(question)
+    elif isinstance(q_vec, Future):
+        q_vec = q_vec.result()
+    retrieved = retrieve_chunks(session_id, question, top_n=top_n, q_vec=q_vec)
 
     # ── 4. Citations-required policy ───────────────────────────────────────
     if not is_retrieval_sufficient(retrieved):
@@ -290,23 +577,42 @@ def run_rag(
             "retrieved": retrieved,
         }
 
-    # ── 5. Synthesize with Ollama ──────────────────────────────────────────
-    answer = _call_ollama(question, retrieved)
+    # ── 5. Synthesize with Ollama (unless answered before) ─────────────────
+    # Exact question first, then a near-identical rewording of one
+    cache_key = _answer_cache_key(session_id, lang, question, retrieved)
+    chunk_ids = tuple(r.chunk_index for r in retrieved)
+    answer = None
+    if not bypass_cache:
+        answer = _answer_cache_get(cache_key) or find_similar_answer(
+            session_id, q_vec, lang, chunk_ids
+        )
+
+    if answer is None:
+
+        def remember(fresh: str):
+            _answer_cache_put(cache_key, fresh)
+            remember_answer(session_id, q_vec, lang, chunk_ids, fresh)
+
+        if stream:
+            answer = _call_ollama_stream(question, retrieved, lang, remember)
+        else:
+            answer = _call_ollama(question, retrieved, lang, remember)
 
     # ── 6. Build citations ─────────────────────────────────────────────────
+    # chunk_index → (ExtractedChunk.id, source name); the lists are parallel
+    sources = dict(enumerate(zip(chunk_db_ids, source_names)))
+    unknown = (None, "Document")
     citations = []
     for i, result in enumerate(retrieved):
-        chunk_idx = result["chunk_index"]
-        chunk_db_id = chunk_db_ids[chunk_idx] if chunk_idx < len(chunk_db_ids) else None
-        source_name = (
-            source_names[chunk_idx] if chunk_idx < len(source_names) else "Document"
-        )
+        chunk_db_id, source_name = sources.get(result.chunk_index, unknown)
         citations.append(
             {
                 "label": f"[{i + 1}]",
                 "chunk_id": chunk_db_id,
                 "source_doc": source_name,
-                "excerpt": result["text"][:300],
+                "excerpt": result.excerpt,
+                "score": result.score,
+                "rank": i,
             }
         )
 
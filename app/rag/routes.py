@@ -1,13 +1,28 @@
-import json
 from datetime import datetime, timezone
 
-from flask import Blueprint, abort, jsonify, render_template, request
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_login import current_user, login_required
+from sqlalchemy import insert
 
+from .. import fastjson
 from ..extensions import db
 from ..models import AuditLog, ChatMessage, ExtractedChunk, RagRetrieval, Session
 from ..safety.triage import check_safety
 from .pipeline import run_rag
+from .tasks import (
+    get_session_chunks,
+    index_status,
+    submit_query_embedding,
+    warm_index,
+)
 
 chat_bp = Blueprint("chat", __name__, url_prefix="/chat")
 
@@ -23,38 +38,13 @@ def _own_session_or_404(session_id: int) -> Session:
     return s
 
 
-def _get_session_chunks(session_id: int):
-    """
-    Return parallel lists:
-      chunk_texts  — the text to embed/retrieve (edited > original)
-      chunk_db_ids — ExtractedChunk.id for each
-      source_names — original filename for each
-    """
-    rows = (
-        ExtractedChunk.query.filter_by(session_id=session_id, is_confirmed=1)
-        .order_by(ExtractedChunk.chunk_index)
-        .all()
-    )
-    chunk_texts = []
-    chunk_db_ids = []
-    source_names = []
-
-    for row in rows:
-        text = row.edited_text if row.edited_text else row.chunk_text
-        chunk_texts.append(text)
-        chunk_db_ids.append(row.id)
-        source_names.append(row.upload.original_name if row.upload else "Document")
-
-    return chunk_texts, chunk_db_ids, source_names
-
-
 def _log_audit(user_id: int, session_id: int, event: str, detail: dict):
     db.session.add(
         AuditLog(
             user_id=user_id,
             session_id=session_id,
             event_type=event,
-            event_detail=json.dumps(detail),
+            event_detail=detail,
             created_at=_utcnow(),
         )
     )
@@ -86,6 +76,9 @@ def chat_page(session_id):
         ExtractedChunk.query.filter_by(session_id=session_id, is_confirmed=1).count()
         > 0
     )
+    # Warm a cold index (e.g. after a restart) while the user types
+    if has_docs and index_status(session_id) != "ready":
+        warm_index(session_id, get_session_chunks(session_id)[0])
 
     if s.status == "results":
         s.status = "chat"
@@ -100,6 +93,14 @@ def chat_page(session_id):
     )
 
 
+@chat_bp.route("/<int:session_id>/index_status")
+@login_required
+def index_status_json(session_id):
+    """Polled by the chat page while the session's index is being built."""
+    _own_session_or_404(session_id)
+    return jsonify({"status": index_status(session_id)})
+
+
 # ── Send message (POST — JSON API) ────────────────────────────────────────────
 
 
@@ -111,6 +112,7 @@ def send_message(session_id):
     data = request.get_json(force=True)
     user_text = (data.get("message") or "").strip()
     use_private_only = bool(data.get("use_private_only", True))
+    stream = bool(data.get("stream", False))
 
     if not user_text:
         return jsonify({"error": "Message cannot be empty."}), 400
@@ -127,8 +129,9 @@ def send_message(session_id):
         safety_triggered=0,
         created_at=_utcnow(),
     )
+    # Not flushed on its own: it's inserted together with the reply (or by
+    # the stream's early commit), so the question costs no extra round trip
     db.session.add(user_msg)
-    db.session.flush()
 
     # ── Safety check ───────────────────────────────────────────────────────
     safety = check_safety(user_text)
@@ -183,7 +186,10 @@ def send_message(session_id):
         )
 
     # ── Load session chunks ────────────────────────────────────────────────
-    chunk_texts, chunk_db_ids, source_names = _get_session_chunks(session_id)
+    # The question is embedded meanwhile; run_rag waits for it if needed
+    q_vec = submit_query_embedding(user_text)
+    with db.session.no_autoflush:
+        chunk_texts, chunk_db_ids, source_names = get_session_chunks(session_id)
 
     # ── Run RAG pipeline ───────────────────────────────────────────────────
     result = run_rag(
@@ -194,9 +200,61 @@ def send_message(session_id):
         source_names=source_names,
         use_private_only=use_private_only,
         top_n=5,
+        stream=stream,
+        bypass_cache=bool(data.get("regenerate", False)),
+        q_vec=q_vec,
+    )
+
+    if stream:
+        # Commit the question now rather than holding the write open
+        # for the whole generation
+        db.session.commit()
+        return Response(
+            stream_with_context(_stream_answer(s, result, use_private_only)),
+            mimetype="application/x-ndjson",
+        )
+
+    _save_answer(s, result, use_private_only)
+    db.session.commit()
+
+    return jsonify(
+        {
+            "answer": result["answer"],
+            "citations": result["citations"],
+            "safety_triggered": result["safety_triggered"],
+            "emergency_message": result.get("emergency_message"),
+        }
     )
 
-    # ── Save assistant message ─────────────────────────────────────────────
+
+def _stream_answer(s: Session, result: dict, use_private_only: bool):
+    """
+    NDJSON body for a streamed reply: one {"token": ...} line per piece of
+    the answer, then a final {"done": true, ...} line with the citations
+    once the full answer has been saved.
+    """
+    pieces = []
+    for piece in result["answer"]:
+        pieces.append(piece)
+        yield fastjson.dumps({"token": piece}) + "\n"
+
+    result["answer"] = "".join(pieces).strip()
+    _save_answer(s, result, use_private_only)
+    db.session.commit()
+
+    yield fastjson.dumps(
+        {
+            "done": True,
+            "citations": result["citations"],
+            "safety_triggered": result["safety_triggered"],
+            "emergency_message": result.get("emergency_message"),
+        }
+    ) + "\n"
+
+
+def _save_answer(s: Session, result: dict, use_private_only: bool):
+    """Add the assistant message and its citations (not committed)."""
+    session_id = s.id
     assistant_msg = ChatMessage(
         session_id=session_id,
         role="assistant",
@@ -209,33 +267,19 @@ def send_message(session_id):
     db.session.flush()
 
     # ── Save RAG retrievals (citations) ────────────────────────────────────
-    for citation in result["citations"]:
-        if citation.get("chunk_id"):
-            db.session.add(
-                RagRetrieval(
-                    chat_message_id=assistant_msg.id,
-                    chunk_id=citation["chunk_id"],
-                    similarity_score=next(
-                        (
-                            r["score"]
-                            for r in result["retrieved"]
-                            if r["chunk_index"] == result["citations"].index(citation)
-                        ),
-                        0.0,
-                    ),
-                    citation_label=citation["label"],
-                    source_doc_name=citation["source_doc"],
-                )
-            )
-
-    s.updated_at = _utcnow()
-    db.session.commit()
-
-    return jsonify(
+    # One executemany INSERT for all citations
+    retrievals = [
         {
-            "answer": result["answer"],
-            "citations": result["citations"],
-            "safety_triggered": result["safety_triggered"],
-            "emergency_message": result.get("emergency_message"),
+            "chat_message_id": assistant_msg.id,
+            "chunk_id": citation["chunk_id"],
+            "similarity_score": citation["score"],
+            "citation_label": citation["label"],
+            "source_doc_name": citation["source_doc"],
         }
-    )
+        for citation in result["citations"]
+        if citation.get("chunk_id")
+    ]
+    if retrievals:
+        db.session.execute(insert(RagRetrieval), retrievals)
+
+    s.updated_at = _utcnow()
@@ -0,0 +1,196 @@
+"""
+app/rag/tasks.py
+
+Background FAISS index builds for chat.
+Embedding a session's chunks can take seconds, so builds run in a small
+in-process thread pool: one starts when the user confirms extracted text
+(and when the chat page opens on a cold session), overlapping the work
+with reading/typing time. A question that still finds the build running
+waits up to INDEX_WAIT_SECONDS for it — see wait_for_index.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app, has_app_context
+
+from ..extensions import db
+from ..models import ExtractedChunk, Upload
+from .vector_store import (
+    embed_query,
+    install_session_index,
+    invalidate_session,
+    load_session_index,
+    make_session_index,
+    session_index_exists,
+)
+
+_executor: ThreadPoolExecutor | None = None
+_query_executor: ThreadPoolExecutor | None = None
+
+# session_id → (generation, Future) of its latest build
+_builds: dict[int, tuple[int, Future]] = {}
+_generation = 0
+_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rag-index"
+        )
+    return _executor
+
+
+def submit_query_embedding(question: str) -> Future:
+    """
+    Start embedding a chat question on a worker thread, so it overlaps with
+    loading the session's chunks. Kept off the build pool so a question
+    never queues behind a whole index build. Inline with INDEX_WORKERS = 0.
+    """
+    global _query_executor
+    if _config("INDEX_WORKERS", 2) <= 0:
+        future = Future()
+        try:
+            future.set_result(embed_query(question))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    if _query_executor is None:
+        _query_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="rag-query"
+        )
+    return _query_executor.submit(embed_query, question)
+
+
+def _config(key: str, default):
+    # The pipeline also runs outside an app context (scripts, tests)
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def get_session_chunks(session_id: int):
+    """
+    Return parallel lists:
+      chunk_texts  — the text to embed/retrieve (edited > original)
+      chunk_db_ids — ExtractedChunk.id for each
+      source_names — original filename for each
+    The index is built from chunk_texts in this order, so every caller
+    must load chunks through here.
+    """
+    # Only the needed columns, with the upload name joined in — no ORM
+    # objects and no lazy upload load per row
+    rows = (
+        db.session.query(
+            ExtractedChunk.edited_text,
+            ExtractedChunk.chunk_text,
+            ExtractedChunk.id,
+            Upload.original_name,
+        )
+        .outerjoin(Upload, ExtractedChunk.upload_id == Upload.id)
+        .filter(
+            ExtractedChunk.session_id == session_id,
+            ExtractedChunk.is_confirmed == 1,
+        )
+        .order_by(ExtractedChunk.chunk_index)
+        .all()
+    )
+    chunk_texts = []
+    chunk_db_ids = []
+    source_names = []
+
+    for edited_text, chunk_text, chunk_id, original_name in rows:
+        chunk_texts.append(edited_text if edited_text else chunk_text)
+        chunk_db_ids.append(chunk_id)
+        source_names.append(original_name or "Document")
+
+    return chunk_texts, chunk_db_ids, source_names
+
+
+def submit_index_build(session_id: int, chunks: list[str]) -> Future:
+    """
+    (Re)build a session's index from `chunks`, dropping the cached one.
+    A newer build supersedes any still in flight for the session.
+    With INDEX_WORKERS = 0 the build runs inline (useful for tests).
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        generation = _generation
+        invalidate_session(session_id)
+
+    workers = _config("INDEX_WORKERS", 2)
+    if workers <= 0:
+        future = Future()
+        _builds[session_id] = (generation, future)
+        try:
+            future.set_result(_build(session_id, chunks, generation))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    with _lock:
+        future = _get_executor(workers).submit(_build, session_id, chunks, generation)
+        _builds[session_id] = (generation, future)
+    return future
+
+
+def _build(session_id: int, chunks: list[str], generation: int) -> bool:
+    try:
+        store = make_session_index(chunks)
+    except Exception as e:
+        print(f"[RAG] Index build for session {session_id} failed: {e}")
+        raise
+    with _lock:
+        latest = _builds.get(session_id)
+        if store is None or (latest is not None and latest[0] != generation):
+            return False  # no chunks, or superseded by a newer build
+        install_session_index(session_id, store)
+    return True
+
+
+def index_status(session_id: int) -> str:
+    """Build state: "ready", "building", "failed" or "none" (nothing running)."""
+    if session_index_exists(session_id):
+        return "ready"
+    latest = _builds.get(session_id)
+    if latest is None:
+        return "none"
+    future = latest[1]
+    if not future.done():
+        return "building"
+    return "failed" if future.exception() is not None else "none"
+
+
+def warm_index(session_id: int, chunks: list[str]):
+    """
+    Get a cold session's index ready: load its saved copy if the chunks
+    are unchanged, else start a build. No-op while one is ready or running.
+    """
+    if index_status(session_id) in ("none", "failed"):
+        if not load_session_index(session_id, chunks):
+            submit_index_build(session_id, chunks)
+
+
+def wait_for_index(session_id: int, chunks: list[str]) -> bool:
+    """
+    Make sure the session's index exists, loading the saved copy or
+    starting a build if none is running. Waits up to INDEX_WAIT_SECONDS;
+    returns False if the build is still going by then. Build errors are
+    raised to the caller.
+    """
+    if session_index_exists(session_id) or load_session_index(session_id, chunks):
+        return True
+
+    latest = _builds.get(session_id)
+    if latest is None or latest[1].done():
+        # Never built, failed, or evicted since — start over
+        future = submit_index_build(session_id, chunks)
+    else:
+        future = latest[1]
+
+    try:
+        future.result(timeout=_config("INDEX_WAIT_SECONDS", 5))
+    except FutureTimeout:
+        return False
+    return session_index_exists(session_id)
@@ -5,26 +5,258 @@ This means questions like "what are my results?" correctly match
 document text like "REPORT STATUS: FINAL" through semantic similarity.
 """
 
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 # ── Singleton model loader ─────────────────────────────────────────────────────
+# EMBED_ONNX_DIR: a folder from scripts/export_onnx_embedder.py. When set (and
+# onnxruntime is installed) chunks and queries are embedded by the int8 ONNX
+# MiniLM instead of sentence-transformers' FP32 PyTorch — same vectors to
+# within quantisation error at several times the CPU throughput.
+EMBED_ONNX_DIR = os.environ.get("EMBED_ONNX_DIR", "")
+EMBED_BATCH_SIZE = 64
+# "bfloat16" halves the PyTorch model's weights and speeds up encoding on
+# CPUs with native BF16 (AVX512-BF16 / AMX); elsewhere it is slower, so
+# float32 stays the default. Vectors are returned as float32 either way.
+EMBED_DTYPE = os.environ.get("EMBED_DTYPE", "float32")
+EMBED_MAX_TOKENS = 256  # all-MiniLM-L6-v2's max_seq_length
+
 _model = None
+_model_lock = threading.Lock()  # index builds run on worker threads
+
+
+class _OnnxEncoder:
+    """
+    Stand-in for SentenceTransformer.encode over the ONNX export: mean-pooled,
+    L2-normalised float32 embeddings. Texts are batched by length, so each
+    batch pads only to its own longest text.
+    """
+
+    def __init__(self, model_dir: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, "model_quantized.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def encode(self, texts: list[str], batch_size: int = EMBED_BATCH_SIZE, **_kwargs):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        pooled = []
+        for start in range(0, len(texts), batch_size):
+            batch = self._tokenizer(
+                [texts[i] for i in order[start : start + batch_size]],
+                padding=True,
+                truncation=True,
+                max_length=EMBED_MAX_TOKENS,
+                return_tensors="np",
+            )
+            hidden = self._session.run(
+                None,
+                {
+                    name: value.astype(np.int64)
+                    for name, value in batch.items()
+                    if name in self._input_names
+                },
+            )[0]  # (batch, tokens, dim)
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled.append(
+                (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            )
 
+        # Back into the caller's order
+        embeddings = np.empty((len(texts), pooled[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(pooled)
+        faiss.normalize_L2(embeddings)
+        return embeddings
 
-def get_model() -> SentenceTransformer:
+
+def get_model():
     """Load model once and cache it for the process lifetime."""
     global _model
-    if _model is None:
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is not None:
+            return _model
+        if EMBED_ONNX_DIR:
+            try:
+                print("[RAG] Loading ONNX embedding model...")
+                _model = _OnnxEncoder(EMBED_ONNX_DIR)
+                print("[RAG] Model loaded.")
+                return _model
+            except ImportError as e:
+                print(f"[RAG] ONNX embedder unavailable ({e}), using PyTorch.")
+
+        # Imported lazily — sentence-transformers pulls in torch, which is
+        # far too heavy to pay for at app import time.
+        import torch
+        from sentence_transformers import SentenceTransformer
+
         print("[RAG] Loading sentence transformer model...")
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        _model = SentenceTransformer(
+            "all-MiniLM-L6-v2",
+            model_kwargs={"torch_dtype": getattr(torch, EMBED_DTYPE)},
+        )
         print("[RAG] Model loaded.")
     return _model
 
 
-# ── In-memory index cache: session_id → {index, chunks} ──────────────────────
-_session_indexes: dict[int, dict] = {}
+def init_app(app):
+    """Start loading the model in the background so the first question doesn't."""
+    if not app.config.get("EMBED_PRELOAD"):
+        return
+    threading.Thread(target=_warm_up, name="embed-warmup", daemon=True).start()
+
+
+def _warm_up():
+    try:
+        # One real encode, so first-call setup (kernels, ONNX session) is done too
+        _encode(["warm-up"])
+    except Exception as e:
+        print(f"[RAG] Warm-up failed: {e}")
+
+
+def _encode(texts: list[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """L2-normalised float32 embeddings for `texts`, one row per text."""
+    model = get_model()
+    if isinstance(model, _OnnxEncoder):
+        return model.encode(texts, batch_size=batch_size)
+
+    import torch
+
+    # inference_mode also skips the autograd version counters no_grad keeps
+    with torch.inference_mode():
+        embeddings = model.encode(
+            texts,
+            normalize_embeddings=True,  # L2 normalise → cosine = dot product
+            show_progress_bar=False,
+            batch_size=batch_size,
+        )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+# ── In-memory index cache: session_id → {index, chunks, answers} ───────────────
+# Least recently searched sessions drop out past INDEX_CACHE_SIZE; their
+# saved copy (see INDEX_DIR) is loaded again when they're next used.
+INDEX_CACHE_SIZE = int(os.environ.get("INDEX_CACHE_SIZE", "64"))
+# Shared by request threads and index-build workers, so under _indexes_lock
+_session_indexes: OrderedDict[int, dict] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _cache_store(session_id: int, store: dict):
+    with _indexes_lock:
+        _session_indexes[session_id] = store
+        _session_indexes.move_to_end(session_id)
+        while len(_session_indexes) > INDEX_CACHE_SIZE:
+            _session_indexes.popitem(last=False)
+
+
+def _cached_store(session_id: int, touch: bool = False) -> dict | None:
+    """The session's cached index store, or None; `touch` marks it recently used."""
+    with _indexes_lock:
+        store = _session_indexes.get(session_id)
+        if store is not None and touch:
+            _session_indexes.move_to_end(session_id)
+    return store
+
+
+# Semantic answer cache, kept per session alongside its index so that
+# rebuilding or invalidating the index drops the answers with it
+SEMANTIC_CACHE_SIZE = 32
+SEMANTIC_CACHE_THRESHOLD = 0.95  # cosine similarity between questions
+
+# How much of a chunk goes into the LLM prompt and into a citation excerpt
+PROMPT_CHARS = 600
+EXCERPT_CHARS = 300
+
+# Sessions with this many chunks get an HNSW graph (approximate, ~log N per
+# query) instead of an exact flat scan; below it the scan is already cheap
+HNSW_MIN_CHUNKS = 1000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+# Very large sessions store 8-bit scalar-quantised vectors (384 bytes instead
+# of 1536 per chunk) in an inverted file; nprobe of its lists are scanned per
+# query. Training wants ~39 points per list, hence the floor.
+IVF_MIN_CHUNKS = 10000
+IVF_NLIST = 256
+IVF_NPROBE = 16
+
+# Bump when the index layout above changes, so saved indexes are rebuilt
+INDEX_FORMAT = 4
+
+# ── Repeated chunks ───────────────────────────────────────────────────────────
+# Re-uploaded pages and repeated boilerplate make some chunks exact copies of
+# others (up to whitespace). Each distinct text is embedded once, as its first
+# copy, and results cite that chunk — the copies say the same thing. Only
+# exact repeats fold — same-template pages with different values ("Hb 9.1" /
+# "Hb 13.4") stay separate rows.
+
+
+def _index_rows(chunks: list[str]) -> list[int]:
+    """Chunk indices to embed: the first copy of each distinct text."""
+    seen: set[str] = set()
+    rows = []
+    for i, chunk in enumerate(chunks):
+        text = " ".join(chunk.split())
+        if text not in seen:
+            seen.add(text)
+            rows.append(i)
+    return rows
+
+
+# ── On-disk indexes: INDEX_DIR/<session_id>-<digest>.faiss ─────────────────────
+# The digest covers the chunk texts, so edited or re-confirmed chunks never
+# load a stale index; a restart re-reads the file instead of re-embedding.
+# Set INDEX_DIR to "" to keep indexes in memory only.
+INDEX_DIR = os.environ.get(
+    "INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "faiss_indexes"),
+)
+
+
+def _chunks_digest(chunks: list[str]) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"v{INDEX_FORMAT}\x00".encode())
+    for chunk in chunks:
+        h.update(chunk.encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _index_path(session_id: int, chunks: list[str]) -> str:
+    return os.path.join(INDEX_DIR, f"{session_id}-{_chunks_digest(chunks)}.faiss")
+
+
+@dataclass(slots=True, frozen=True)
+class RetrievalResult:
+    """
+    One retrieved chunk. prompt_text / excerpt are text cut to
+    PROMPT_CHARS / EXCERPT_CHARS for the LLM prompt and citations.
+    """
+
+    chunk_index: int
+    text: str
+    prompt_text: str
+    excerpt: str
+    score: float
 
 
 def build_session_index(session_id: int, chunks: list[str]) -> bool:
@@ -32,73 +264,221 @@ def build_session_index(session_id: int, chunks: list[str]) -> bool:
     Embed all chunks with sentence transformer and build a FAISS index.
     Returns True on success, False if chunks is empty.
     """
-    if not chunks:
+    store = make_session_index(chunks)
+    if store is None:
         return False
+    install_session_index(session_id, store)
+    return True
 
-    model = get_model()
 
-    # Encode all chunks — returns (N, 384) float32 array
-    embeddings = model.encode(
-        chunks,
-        normalize_embeddings=True,  # L2 normalise → cosine = dot product
-        show_progress_bar=False,
-        batch_size=32,
-    )
-    embeddings = np.array(embeddings, dtype=np.float32)
+def make_session_index(chunks: list[str]) -> dict | None:
+    """
+    The embedding half of build_session_index, without caching the result —
+    background builds (rag/tasks.py) install it only if still current.
+    Returns None if chunks is empty.
+    """
+    if not chunks:
+        return None
+
+    rows = _index_rows(chunks)
+    # Encode the kept chunks — returns (rows, 384) float32 array
+    embeddings = _encode([chunks[i] for i in rows])
 
     dim = embeddings.shape[1]  # 384 for MiniLM
-    index = faiss.IndexFlatIP(dim)  # inner product on normalised = cosine
-    index.add(embeddings)
+    # Inner product on normalised vectors = cosine
+    if len(rows) >= IVF_MIN_CHUNKS:
+        index = faiss.index_factory(
+            dim, f"IVF{IVF_NLIST},SQ8", faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+    elif len(rows) >= HNSW_MIN_CHUNKS:
+        index = faiss.index_factory(dim, f"HNSW{HNSW_M}", faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        index = faiss.IndexFlatIP(dim)
+    # Searches return chunk indices, and the mapping is saved with the index
+    index = faiss.IndexIDMap(index)
+    index.add_with_ids(embeddings, np.asarray(rows, dtype=np.int64))
+    _set_search_params(index)
 
-    _session_indexes[session_id] = {
+    return {
         "index": index,
         "chunks": chunks,
+        # (q_vec, lang, chunk_ids, answer)
+        "answers": deque(maxlen=SEMANTIC_CACHE_SIZE),
     }
+
+
+def _set_search_params(index):
+    # Query-time knobs aren't saved with the index, so they're set on load too
+    index = faiss.downcast_index(index.index)  # inside the IndexIDMap
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    if hasattr(index, "nprobe"):
+        index.nprobe = IVF_NPROBE
+
+
+def install_session_index(session_id: int, store: dict):
+    """
+    Cache an index from make_session_index for the session, and save it
+    under INDEX_DIR (replacing the session's older index files).
+    """
+    _cache_store(session_id, store)
+    if not INDEX_DIR:
+        return
+    path = _index_path(session_id, store["chunks"])
+    try:
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        faiss.write_index(store["index"], path + ".tmp")
+        os.replace(path + ".tmp", path)
+        for old in glob.glob(os.path.join(INDEX_DIR, f"{session_id}-*.faiss")):
+            if old != path:
+                os.remove(old)
+    except OSError as e:
+        print(f"[RAG] Could not save index for session {session_id}: {e}")
+
+
+def load_session_index(session_id: int, chunks: list[str]) -> bool:
+    """
+    Cache the session's saved index for exactly these chunks, if there is
+    one. Memory-mapped, so only the pages searches touch are read in.
+    """
+    if not INDEX_DIR or not chunks:
+        return False
+    path = _index_path(session_id, chunks)
+    if not os.path.exists(path):
+        return False
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except RuntimeError as e:
+        print(f"[RAG] Could not load index for session {session_id}: {e}")
+        return False
+    if index.ntotal != len(_index_rows(chunks)):
+        return False
+    _set_search_params(index)
+    _cache_store(
+        session_id,
+        {
+            "index": index,
+            "chunks": chunks,
+            "answers": deque(maxlen=SEMANTIC_CACHE_SIZE),
+        },
+    )
     return True
 
 
-def retrieve_chunks(session_id: int, query: str, top_n: int = 5) -> list[dict]:
+# Recent query embeddings, so a repeated question skips the encoder. MiniLM
+# is uncased and ignores extra whitespace, so keys are normalised that way.
+QUERY_CACHE_SIZE = 256
+_query_vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+_query_vectors_lock = threading.Lock()
+
+
+def embed_query(query: str) -> np.ndarray:
+    """Encode a query the same way as the chunks — returns a (1, 384) array."""
+    key = " ".join(query.lower().split())
+    with _query_vectors_lock:
+        q_vec = _query_vectors.get(key)
+        if q_vec is not None:
+            _query_vectors.move_to_end(key)
+            return q_vec
+
+    # Encoded outside the lock, so other questions aren't held behind it
+    q_vec = _encode([query])
+    q_vec.flags.writeable = False  # shared between callers
+    with _query_vectors_lock:
+        _query_vectors[key] = q_vec
+        _query_vectors.move_to_end(key)
+        while len(_query_vectors) > QUERY_CACHE_SIZE:
+            _query_vectors.popitem(last=False)
+    return q_vec
+
+
+def retrieve_chunks(
+    session_id: int, query: str, top_n: int = 5, q_vec: np.ndarray | None = None
+) -> list[RetrievalResult]:
     """
-    Retrieve top-N semantically similar chunks for a query.
-    Returns list of { chunk_index, text, score }.
+    Retrieve top-N semantically similar chunks for a query, best first.
+    Repeated chunks were folded together at build, so each distinct text
+    comes back once, as its first copy (see _index_rows).
+    Pass q_vec (from embed_query) to reuse an embedding already computed.
     """
-    if session_id not in _session_indexes:
+    store = _cached_store(session_id, touch=True)
+    if store is None:
         return []
 
-    store = _session_indexes[session_id]
     index = store["index"]
     chunks = store["chunks"]
-    model = get_model()
-
-    # Encode the query the same way
-    q_vec = model.encode(
-        [query],
-        normalize_embeddings=True,
-        show_progress_bar=False,
-    )
-    q_vec = np.array(q_vec, dtype=np.float32)
+    if q_vec is None:
+        q_vec = embed_query(query)
 
-    k = min(top_n, len(chunks))
+    k = min(top_n, index.ntotal)
     scores, ids = index.search(q_vec, k)
 
     results = []
-    for score, idx in zip(scores[0], ids[0]):
-        if idx >= 0:
-            results.append(
-                {
-                    "chunk_index": int(idx),
-                    "text": chunks[idx],
-                    "score": float(score),
-                }
+    for score, idx in zip(scores[0], ids[0].tolist()):
+        if idx < 0:
+            continue
+        prompt_text = chunks[idx][:PROMPT_CHARS]
+        results.append(
+            RetrievalResult(
+                chunk_index=idx,
+                text=chunks[idx],
+                prompt_text=prompt_text,
+                excerpt=prompt_text[:EXCERPT_CHARS],
+                score=float(score),
             )
+        )
 
     return results
 
 
+def find_similar_answer(
+    session_id: int, q_vec: np.ndarray, lang: str, chunk_ids: tuple[int, ...]
+) -> str | None:
+    """
+    Return a cached answer to an earlier question in this session whose
+    embedding is within SEMANTIC_CACHE_THRESHOLD of q_vec, or None.
+    Only answers written from the same retrieved chunks, in the same order,
+    qualify: citations are rebuilt from the current retrieval, so its [n]
+    labels must point at the chunks the answer was written from.
+    """
+    store = _cached_store(session_id)
+    if store is None:
+        return None
+    entries = [e for e in store["answers"] if e[1] == lang and e[2] == chunk_ids]
+    if not entries:
+        return None
+
+    # Vectors are normalised, so the dot product is the cosine similarity
+    scores = np.stack([e[0] for e in entries]) @ q_vec[0]
+    best = int(np.argmax(scores))
+    if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return entries[best][3]
+    return None
+
+
+def remember_answer(
+    session_id: int,
+    q_vec: np.ndarray,
+    lang: str,
+    chunk_ids: tuple[int, ...],
+    answer: str,
+):
+    """
+    Add an answer, with the chunk indices it was written from, to the
+    session's semantic cache (oldest entries drop off).
+    """
+    store = _cached_store(session_id)
+    if store is not None:
+        store["answers"].append((q_vec[0], lang, chunk_ids, answer))
+
+
 def invalidate_session(session_id: int):
-    """Remove cached index for a session."""
-    _session_indexes.pop(session_id, None)
+    """Remove cached index for a session (saved files stay; see INDEX_DIR)."""
+    with _indexes_lock:
+        _session_indexes.pop(session_id, None)
 
 
 def session_index_exists(session_id: int) -> bool:
-    return session_id in _session_indexes
+    return _cached_store(session_id) is not None
@@ -0,0 +1,119 @@
+"""
+app/reports/context.py
+
+Report contexts: the plain dicts a patient/pharmacy PDF is rendered from.
+Kept apart from generator.py so the request path never imports ReportLab —
+only the render worker needs it.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from .. import fastjson
+
+
+def utcnow_str():
+    return datetime.now(timezone.utc).strftime("%B %d, %Y at %H:%M UTC")
+
+
+# ── Patient Report ─────────────────────────────────────────────────────────────
+
+
+def build_patient_report(session, intake, diseases, chat_messages, retrievals):
+    top_diseases = []
+    for dr in diseases[:5]:
+        explanation = dr.explanation_json or {}
+        top_diseases.append(
+            {
+                "rank": dr.rank,
+                "disease_name": dr.disease.disease_name,
+                "icd_code": dr.disease.icd_code or "",
+                "short_desc": dr.disease.short_desc or "",
+                "similarity_score": dr.similarity_score,
+                "matching_phrases": explanation.get("matching_phrases", []),
+            }
+        )
+
+    citations = _build_citations(retrievals)
+
+    return {
+        "report_type": "patient",
+        "generated_at": utcnow_str(),
+        "session_title": session.title,
+        "session_id": session.id,
+        "intake": intake,
+        "top_diseases": top_diseases,
+        "citations": citations,
+        "chat_count": len(chat_messages),
+    }
+
+
+def build_pharmacy_report(session, intake, diseases, chat_messages, retrievals):
+    top_diseases = []
+    for dr in diseases[:10]:
+        explanation = dr.explanation_json or {}
+        top_diseases.append(
+            {
+                "rank": dr.rank,
+                "disease_name": dr.disease.disease_name,
+                "icd_code": dr.disease.icd_code or "",
+                "short_desc": dr.disease.short_desc or "",
+                "similarity_score": round(dr.similarity_score * 100, 1),
+                "matching_phrases": explanation.get("matching_phrases", []),
+            }
+        )
+
+    # Citation labels per message, grouped in one pass over the retrievals
+    labels_by_msg = defaultdict(list)
+    for r in retrievals:
+        labels_by_msg[r.chat_message_id].append(r.citation_label)
+
+    rag_findings = []
+    for msg in chat_messages:
+        if msg.role == "assistant" and not msg.safety_triggered:
+            rag_findings.append(
+                {
+                    "content": msg.content[:500],
+                    "citations": labels_by_msg.get(msg.id, []),
+                }
+            )
+
+    citations = _build_citations(retrievals)
+
+    return {
+        "report_type": "pharmacy",
+        "generated_at": utcnow_str(),
+        "session_title": session.title,
+        "session_id": session.id,
+        "intake": intake,
+        "top_diseases": top_diseases,
+        "rag_findings": rag_findings[:5],
+        "citations": citations,
+    }
+
+
+def context_hash(context: dict) -> str:
+    """
+    Digest of a report context, leaving out when it was generated: equal
+    hashes render the same PDF apart from the printed date.
+    """
+    content = {k: v for k, v in context.items() if k != "generated_at"}
+    raw = fastjson.dumps(content, sort_keys=True).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _build_citations(retrievals) -> list[dict]:
+    seen = set()
+    citations = []
+    for r in retrievals:
+        key = (r.citation_label, r.source_doc_name)
+        if key not in seen:
+            seen.add(key)
+            citations.append(
+                {
+                    "label": r.citation_label,
+                    "source_doc": r.source_doc_name or "Document",
+                    "excerpt": r.chunk.chunk_text[:200] if r.chunk else "",
+                }
+            )
+    return citations
@@ -3,17 +3,17 @@ Report generation using ReportLab (pure Python, no system dependencies).
 Builds PDF programmatically — no HTML-to-PDF conversion needed.
 """
 
-import json
 import os
-from datetime import datetime, timezone
-from io import BytesIO
+from functools import cache
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
 from reportlab.platypus import (
+    Flowable,
     HRFlowable,
     Paragraph,
     SimpleDocTemplate,
@@ -38,15 +38,15 @@ WHITE = colors.white
 BLACK = colors.HexColor("#1e293b")
 
 
-def utcnow_str():
-    return datetime.now(timezone.utc).strftime("%B %d, %Y at %H:%M UTC")
-
-
 # ── Style builder ──────────────────────────────────────────────────────────────
 
 
+@cache
 def _styles():
-    getSampleStyleSheet()
+    """
+    Paragraph styles for both reports, built once per process. Shared
+    between renders, so callers must not modify them.
+    """
     custom = {
         "title": ParagraphStyle(
             "title",
@@ -127,133 +127,183 @@ def _styles():
             fontName="Helvetica",
             alignment=TA_CENTER,
         ),
+        # Patient report: match % beside each condition
+        "score": ParagraphStyle(
+            "score",
+            fontSize=10,
+            textColor=BLUE,
+            fontName="Helvetica-Bold",
+            alignment=TA_RIGHT,
+        ),
+        # Pharmacy report: the "not a prescription" box and score column
+        "disc2": ParagraphStyle(
+            "disc2",
+            fontSize=9,
+            textColor=RED,
+            fontName="Helvetica-Bold",
+            leading=13,
+        ),
+        "score_cell": ParagraphStyle(
+            "score_cell",
+            fontSize=9,
+            textColor=BLUE,
+            fontName="Helvetica-Bold",
+        ),
     }
     return custom
 
 
-# ── Patient Report ─────────────────────────────────────────────────────────────
-
-
-def build_patient_report(session, intake, diseases, chat_messages, retrievals):
-    top_diseases = []
-    for dr in diseases[:5]:
-        explanation = {}
-        if dr.explanation_json:
-            try:
-                explanation = json.loads(dr.explanation_json)
-            except Exception:
-                pass
-        top_diseases.append(
-            {
-                "rank": dr.rank,
-                "disease_name": dr.disease.disease_name,
-                "icd_code": dr.disease.icd_code or "",
-                "short_desc": dr.disease.short_desc or "",
-                "similarity_score": dr.similarity_score,
-                "matching_phrases": explanation.get("matching_phrases", []),
-            }
-        )
+# Table styles repeated for every condition card / finding. Table.setStyle
+# only reads them, so one instance serves every row of every render.
+_CARD_HEADER_STYLE = TableStyle(
+    [
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("PADDING", (0, 0), (-1, -1), 0),
+    ]
+)
+_CARD_STYLE = TableStyle(
+    [
+        ("BOX", (0, 0), (-1, -1), 0.5, SLATE_MID),
+        ("BACKGROUND", (0, 0), (-1, -1), SLATE_LIGHT),
+        ("PADDING", (0, 0), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, -1), (-1, -1), 10),
+    ]
+)
+_FINDING_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, -1), GREEN_LIGHT),
+        ("LEFTPADDING", (0, 0), (-1, -1), 10),
+        ("PADDING", (0, 0), (-1, -1), 7),
+        ("BOX", (0, 0), (-1, -1), 0.5, colors.HexColor("#6ee7b7")),
+    ]
+)
 
-    citations = _build_citations(retrievals)
-
-    return {
-        "report_type": "patient",
-        "generated_at": utcnow_str(),
-        "session_title": session.title,
-        "session_id": session.id,
-        "intake": intake,
-        "top_diseases": top_diseases,
-        "citations": citations,
-        "chat_count": len(chat_messages),
-    }
 
+@cache
+def _fixed_frags(text: str, style_name: str) -> tuple:
+    return tuple(Paragraph(text, _styles()[style_name]).frags)
 
-def build_pharmacy_report(session, intake, diseases, chat_messages, retrievals):
-    top_diseases = []
-    for dr in diseases[:10]:
-        explanation = {}
-        if dr.explanation_json:
-            try:
-                explanation = json.loads(dr.explanation_json)
-            except Exception:
-                pass
-        top_diseases.append(
-            {
-                "rank": dr.rank,
-                "disease_name": dr.disease.disease_name,
-                "icd_code": dr.disease.icd_code or "",
-                "short_desc": dr.disease.short_desc or "",
-                "similarity_score": round(dr.similarity_score * 100, 1),
-                "matching_phrases": explanation.get("matching_phrases", []),
-            }
-        )
 
-    rag_findings = []
-    for msg in chat_messages:
-        if msg.role == "assistant" and not msg.safety_triggered:
-            msg_retrievals = [r for r in retrievals if r.chat_message_id == msg.id]
-            rag_findings.append(
-                {
-                    "content": msg.content[:500],
-                    "citations": [r.citation_label for r in msg_retrievals],
-                }
-            )
+def _fixed(text: str, style_name: str) -> Paragraph:
+    """
+    Paragraph for text that's the same in every report (headings, labels,
+    disclaimers): its markup is parsed once per process. Layout clones a
+    fragment before changing it, so the parsed fragments can be shared —
+    the Paragraph itself can't, it holds per-render layout state.
+    """
+    return Paragraph(
+        text, _styles()[style_name], frags=list(_fixed_frags(text, style_name))
+    )
 
-    citations = _build_citations(retrievals)
-
-    return {
-        "report_type": "pharmacy",
-        "generated_at": utcnow_str(),
-        "session_title": session.title,
-        "session_id": session.id,
-        "intake": intake,
-        "top_diseases": top_diseases,
-        "rag_findings": rag_findings[:5],
-        "citations": citations,
-    }
 
+class _IntakeRows(Flowable):
+    """
+    The intake section's label/value rows, drawn straight onto the canvas:
+    no Table column solving and no Paragraph per cell. Values are plain
+    text, wrapped with simpleSplit. The section breaks across pages between
+    rows, or inside a value too long for what's left of the page.
+    """
+
+    PAD_X, PAD_TOP, PAD_BOTTOM = 6, 3, 5
+
+    def __init__(self, rows: list[tuple[str, str]], label_width: float):
+        super().__init__()
+        # Whitespace collapsed, as a Paragraph would render it
+        self.rows = [(label, " ".join(value.split())) for label, value in rows]
+        self.label_width = label_width
+        self._lines = []
+
+    def _wrap_values(self, avail_width: float) -> list[list[str]]:
+        body = _styles()["body"]
+        width = avail_width - self.label_width - 2 * self.PAD_X
+        return [
+            simpleSplit(value, body.fontName, body.fontSize, width) or [""]
+            for _, value in self.rows
+        ]
 
-def _build_citations(retrievals) -> list[dict]:
-    seen = set()
-    citations = []
-    for r in retrievals:
-        key = (r.citation_label, r.source_doc_name)
-        if key not in seen:
-            seen.add(key)
-            citations.append(
-                {
-                    "label": r.citation_label,
-                    "source_doc": r.source_doc_name or "Document",
-                    "excerpt": r.chunk.chunk_text[:200] if r.chunk else "",
-                }
-            )
-    return citations
+    def _row_height(self, lines: list[str]) -> float:
+        return self.PAD_TOP + len(lines) * _styles()["body"].leading + self.PAD_BOTTOM
+
+    def wrap(self, availWidth, availHeight):
+        self._lines = self._wrap_values(availWidth)
+        self.width = availWidth
+        self.height = sum(self._row_height(lines) for lines in self._lines)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        used = 0
+        for i, lines in enumerate(self._wrap_values(availWidth)):
+            height = self._row_height(lines)
+            if used + height > availHeight:
+                break
+            used += height
+        else:
+            return [self]
+        # Row i doesn't fit: keep the lines of it that do, the rest of its
+        # value carries on (unlabelled) in the next frame
+        room = availHeight - used - self.PAD_TOP - self.PAD_BOTTOM
+        keep = max(0, int(room // _styles()["body"].leading))
+        label = self.rows[i][0]
+        head, tail = self.rows[:i], self.rows[i + 1 :]
+        if keep:
+            head = head + [(label, " ".join(lines[:keep]))]
+            tail = [("", " ".join(lines[keep:]))] + tail
+        else:
+            tail = [self.rows[i]] + tail
+        if not head:
+            return []  # nothing fits: move to the next frame
+        return [
+            _IntakeRows(head, self.label_width),
+            _IntakeRows(tail, self.label_width),
+        ]
+
+    def draw(self):
+        label, body = _styles()["label"], _styles()["body"]
+        canv = self.canv
+        top = self.height
+        for (text, _), lines in zip(self.rows, self._lines):
+            # Baselines one font size below the top, as in a Paragraph
+            y = top - self.PAD_TOP
+            canv.setFillColor(label.textColor)
+            canv.setFont(label.fontName, label.fontSize)
+            canv.drawString(self.PAD_X, y - label.fontSize, text)
+            canv.setFillColor(body.textColor)
+            canv.setFont(body.fontName, body.fontSize)
+            for n, line in enumerate(lines):
+                canv.drawString(
+                    self.label_width + self.PAD_X,
+                    y - body.fontSize - n * body.leading,
+                    line,
+                )
+            top -= self._row_height(lines)
 
 
 # ── PDF renderers ──────────────────────────────────────────────────────────────
 
 
-def render_report_pdf(report_type: str, context: dict) -> bytes:
+def render_report_pdf(report_type: str, context: dict, out):
+    """Build the PDF into `out`, a file path or writable binary file."""
     if report_type == "patient":
-        return _render_patient_pdf(context)
-    return _render_pharmacy_pdf(context)
+        _render_patient_pdf(context, out)
+    else:
+        _render_pharmacy_pdf(context, out)
 
 
-def _render_patient_pdf(ctx: dict) -> bytes:
-    buffer = BytesIO()
+def _render_patient_pdf(ctx: dict, out):
     doc = SimpleDocTemplate(
-        buffer,
+        out,
         pagesize=A4,
         leftMargin=18 * mm,
         rightMargin=18 * mm,
         topMargin=18 * mm,
         bottomMargin=18 * mm,
+        invariant=1,
     )
     s = _styles()
     story = []
 
     # ── Header ────────────────────────────────────────────────────────────
-    story.append(Paragraph("⚕ Patient Health Summary", s["title"]))
+    story.append(_fixed("⚕ Patient Health Summary", "title"))
     story.append(
         Paragraph(
             f"Session: {ctx['session_title']} &nbsp;|&nbsp; "
@@ -266,12 +316,12 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     # ── Disclaimer box ────────────────────────────────────────────────────
     disclaimer_data = [
         [
-            Paragraph(
+            _fixed(
                 "<b>⚠ NOT MEDICAL ADVICE.</b> This document is for informational "
                 "purposes only and does not constitute a medical diagnosis, "
                 "prescription, or treatment recommendation. Always consult a "
                 "qualified healthcare professional.",
-                s["disclaimer"],
+                "disclaimer",
             )
         ]
     ]
@@ -290,7 +340,7 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     story.append(Spacer(1, 12))
 
     # ── Intake ────────────────────────────────────────────────────────────
-    story.append(Paragraph("Your Reported Symptoms", s["h2"]))
+    story.append(_fixed("Your Reported Symptoms", "h2"))
     story.append(HRFlowable(width="100%", thickness=0.5, color=SLATE_MID, spaceAfter=8))
 
     intake_rows = []
@@ -306,34 +356,19 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     for key, label in field_labels.items():
         value = ctx["intake"].get(key, "")
         if value:
-            intake_rows.append(
-                [
-                    Paragraph(label, s["label"]),
-                    Paragraph(str(value), s["body"]),
-                ]
-            )
+            intake_rows.append((label, str(value)))
 
     if intake_rows:
-        intake_table = Table(intake_rows, colWidths=[40 * mm, 130 * mm])
-        intake_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
-                    ("TOPPADDING", (0, 0), (-1, -1), 3),
-                ]
-            )
-        )
-        story.append(intake_table)
+        story.append(_IntakeRows(intake_rows, label_width=40 * mm))
 
     # ── Top conditions ────────────────────────────────────────────────────
-    story.append(Paragraph("Possible Conditions to Discuss", s["h2"]))
+    story.append(_fixed("Possible Conditions to Discuss", "h2"))
     story.append(HRFlowable(width="100%", thickness=0.5, color=SLATE_MID, spaceAfter=6))
     story.append(
-        Paragraph(
+        _fixed(
             "These are informational matches based on symptom similarity. "
             "Higher % = more symptom overlap. This is <b>not</b> a diagnosis.",
-            s["small"],
+            "small",
         )
     )
     story.append(Spacer(1, 6))
@@ -351,25 +386,12 @@ def _render_patient_pdf(ctx: dict) -> bytes:
                 ),
                 Paragraph(
                     f"<b>{score_pct}%</b> match",
-                    ParagraphStyle(
-                        "score",
-                        fontSize=10,
-                        textColor=BLUE,
-                        fontName="Helvetica-Bold",
-                        alignment=TA_RIGHT,
-                    ),
+                    s["score"],
                 ),
             ]
         ]
         header_table = Table(header_data, colWidths=[130 * mm, 40 * mm])
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                    ("PADDING", (0, 0), (-1, -1), 0),
-                ]
-            )
-        )
+        header_table.setStyle(_CARD_HEADER_STYLE)
 
         card_content = [
             [header_table],
@@ -389,21 +411,12 @@ def _render_patient_pdf(ctx: dict) -> bytes:
             )
 
         card = Table(card_content, colWidths=["100%"])
-        card.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.5, SLATE_MID),
-                    ("BACKGROUND", (0, 0), (-1, -1), SLATE_LIGHT),
-                    ("PADDING", (0, 0), (-1, -1), 8),
-                    ("BOTTOMPADDING", (0, -1), (-1, -1), 10),
-                ]
-            )
-        )
+        card.setStyle(_CARD_STYLE)
         story.append(card)
         story.append(Spacer(1, 6))
 
     # ── Urgent care ───────────────────────────────────────────────────────
-    story.append(Paragraph("When to Seek Urgent Care", s["h2"]))
+    story.append(_fixed("When to Seek Urgent Care", "h2"))
     story.append(HRFlowable(width="100%", thickness=0.5, color=SLATE_MID, spaceAfter=6))
     urgent_items = [
         "Chest pain, pressure, or tightness",
@@ -415,14 +428,14 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     ]
     urgent_data = [
         [
-            Paragraph(
+            _fixed(
                 "<b>Call emergency services (911 / 999 / 112) immediately if:</b>",
-                s["disclaimer"],
+                "disclaimer",
             )
         ]
     ]
     for item in urgent_items:
-        urgent_data.append([Paragraph(f"• {item}", s["bullet"])])
+        urgent_data.append([_fixed(f"• {item}", "bullet")])
 
     urgent_table = Table(urgent_data, colWidths=["100%"])
     urgent_table.setStyle(
@@ -438,7 +451,7 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     story.append(Spacer(1, 10))
 
     # ── Questions to ask ──────────────────────────────────────────────────
-    story.append(Paragraph("Questions to Ask Your Doctor", s["h2"]))
+    story.append(_fixed("Questions to Ask Your Doctor", "h2"))
     story.append(HRFlowable(width="100%", thickness=0.5, color=SLATE_MID, spaceAfter=6))
     questions = [
         (
@@ -472,7 +485,7 @@ def _render_patient_pdf(ctx: dict) -> bytes:
 
     # ── Citations ─────────────────────────────────────────────────────────
     if ctx.get("citations"):
-        story.append(Paragraph("Document Sources", s["h2"]))
+        story.append(_fixed("Document Sources", "h2"))
         story.append(
             HRFlowable(width="100%", thickness=0.5, color=SLATE_MID, spaceAfter=6)
         )
@@ -494,24 +507,23 @@ def _render_patient_pdf(ctx: dict) -> bytes:
     )
 
     doc.build(story)
-    return buffer.getvalue()
 
 
-def _render_pharmacy_pdf(ctx: dict) -> bytes:
-    buffer = BytesIO()
+def _render_pharmacy_pdf(ctx: dict, out):
     doc = SimpleDocTemplate(
-        buffer,
+        out,
         pagesize=A4,
         leftMargin=18 * mm,
         rightMargin=18 * mm,
         topMargin=18 * mm,
         bottomMargin=18 * mm,
+        invariant=1,
     )
     s = _styles()
     story = []
 
     # ── Header ────────────────────────────────────────────────────────────
-    story.append(Paragraph("💊 Informational Pharmacy Summary", s["title"]))
+    story.append(_fixed("💊 Informational Pharmacy Summary", "title"))
     story.append(
         Paragraph(
             f"Session: {ctx['session_title']} | " f"Generated: {ctx['generated_at']}",
@@ -523,18 +535,12 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
     # ── Big disclaimer ────────────────────────────────────────────────────
     disc_data = [
         [
-            Paragraph(
+            _fixed(
                 "<b>⛔ NOT A PRESCRIPTION. NOT A CLINICAL DIAGNOSIS.</b><br/>"
                 "This is an informational summary generated from patient "
                 "self-reported data and uploaded documents. All information "
                 "must be independently verified before any clinical action.",
-                ParagraphStyle(
-                    "disc2",
-                    fontSize=9,
-                    textColor=RED,
-                    fontName="Helvetica-Bold",
-                    leading=13,
-                ),
+                "disc2",
             )
         ]
     ]
@@ -552,7 +558,7 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
     story.append(Spacer(1, 12))
 
     # ── Intake ────────────────────────────────────────────────────────────
-    story.append(Paragraph("Patient-Reported Intake", s["h2"]))
+    story.append(_fixed("Patient-Reported Intake", "h2"))
     story.append(
         HRFlowable(width="100%", thickness=0.5, color=GREEN_LIGHT, spaceAfter=6)
     )
@@ -569,38 +575,23 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
     for key, label in field_labels.items():
         value = ctx["intake"].get(key, "")
         if value:
-            intake_rows.append(
-                [
-                    Paragraph(label, s["label"]),
-                    Paragraph(str(value), s["body"]),
-                ]
-            )
+            intake_rows.append((label, str(value)))
     if intake_rows:
-        t = Table(intake_rows, colWidths=[38 * mm, 132 * mm])
-        t.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
-                    ("TOPPADDING", (0, 0), (-1, -1), 3),
-                ]
-            )
-        )
-        story.append(t)
+        story.append(_IntakeRows(intake_rows, label_width=38 * mm))
 
     # ── Top 10 conditions table ───────────────────────────────────────────
-    story.append(Paragraph("Top Condition Candidates", s["h2"]))
+    story.append(_fixed("Top Condition Candidates", "h2"))
     story.append(
         HRFlowable(width="100%", thickness=0.5, color=GREEN_LIGHT, spaceAfter=6)
     )
 
     table_data = [
         [
-            Paragraph("Rank", s["label"]),
-            Paragraph("Condition", s["label"]),
-            Paragraph("ICD", s["label"]),
-            Paragraph("Score", s["label"]),
-            Paragraph("Evidence Terms", s["label"]),
+            _fixed("Rank", "label"),
+            _fixed("Condition", "label"),
+            _fixed("ICD", "label"),
+            _fixed("Score", "label"),
+            _fixed("Evidence Terms", "label"),
         ]
     ]
     for d in ctx["top_diseases"]:
@@ -612,12 +603,7 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
                 Paragraph(d["icd_code"], s["small"]),
                 Paragraph(
                     f"{d['similarity_score']}%",
-                    ParagraphStyle(
-                        "score_cell",
-                        fontSize=9,
-                        textColor=BLUE,
-                        fontName="Helvetica-Bold",
-                    ),
+                    s["score_cell"],
                 ),
                 Paragraph(terms, s["small"]),
             ]
@@ -641,16 +627,16 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
     )
     story.append(cond_table)
     story.append(
-        Paragraph(
+        _fixed(
             "Score = semantic similarity between intake and condition description. "
             "Does not indicate diagnosis probability.",
-            s["small"],
+            "small",
         )
     )
 
     # ── RAG findings ──────────────────────────────────────────────────────
     if ctx.get("rag_findings"):
-        story.append(Paragraph("Document-Derived Findings", s["h2"]))
+        story.append(_fixed("Document-Derived Findings", "h2"))
         story.append(
             HRFlowable(width="100%", thickness=0.5, color=GREEN_LIGHT, spaceAfter=6)
         )
@@ -666,22 +652,13 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
                 ]
             ]
             ft = Table(finding_data, colWidths=["100%"])
-            ft.setStyle(
-                TableStyle(
-                    [
-                        ("BACKGROUND", (0, 0), (-1, -1), GREEN_LIGHT),
-                        ("LEFTPADDING", (0, 0), (-1, -1), 10),
-                        ("PADDING", (0, 0), (-1, -1), 7),
-                        ("BOX", (0, 0), (-1, -1), 0.5, colors.HexColor("#6ee7b7")),
-                    ]
-                )
-            )
+            ft.setStyle(_FINDING_STYLE)
             story.append(ft)
             story.append(Spacer(1, 4))
 
     # ── Citations ─────────────────────────────────────────────────────────
     if ctx.get("citations"):
-        story.append(Paragraph("Source Citations", s["h2"]))
+        story.append(_fixed("Source Citations", "h2"))
         story.append(
             HRFlowable(width="100%", thickness=0.5, color=GREEN_LIGHT, spaceAfter=6)
         )
@@ -694,12 +671,12 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
             )
 
     # ── Clinical disclaimer ───────────────────────────────────────────────
-    story.append(Paragraph("Clinical Disclaimer", s["h2"]))
+    story.append(_fixed("Clinical Disclaimer", "h2"))
     story.append(
         HRFlowable(width="100%", thickness=0.5, color=GREEN_LIGHT, spaceAfter=6)
     )
     story.append(
-        Paragraph(
+        _fixed(
             "This summary was generated by an automated informational tool. "
             "It is based entirely on patient self-reported symptoms and uploaded "
             "documents. Reported medications and allergies have not been clinically "
@@ -707,7 +684,7 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
             "matching and do not represent clinical assessment or medical opinion. "
             "No prescriptive or treatment authority is implied. All clinical "
             "decisions must be made by a licensed healthcare professional.",
-            s["body"],
+            "body",
         )
     )
 
@@ -723,16 +700,24 @@ def _render_pharmacy_pdf(ctx: dict) -> bytes:
     )
 
     doc.build(story)
-    return buffer.getvalue()
 
 
 def save_pdf(
-    pdf_bytes: bytes, session_id: int, report_type: str, upload_folder: str
+    report_type: str, context: dict, session_id: int, upload_folder: str
 ) -> str:
+    """
+    Render the report straight to its file under upload_folder and return
+    the path. Written beside it and then moved into place, so a download
+    of the previous version never reads a half-written PDF.
+    """
     reports_dir = os.path.join(upload_folder, "reports", str(session_id))
     os.makedirs(reports_dir, exist_ok=True)
     filename = f"{report_type}_report_{session_id}.pdf"
     stored_path = os.path.join(reports_dir, filename)
-    with open(stored_path, "wb") as f:
-        f.write(pdf_bytes)
+    try:
+        render_report_pdf(report_type, context, stored_path + ".tmp")
+        os.replace(stored_path + ".tmp", stored_path)
+    finally:
+        if os.path.exists(stored_path + ".tmp"):
+            os.remove(stored_path + ".tmp")
     return stored_path
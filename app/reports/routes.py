@@ -1,4 +1,3 @@
-import json
 import os
 from datetime import datetime, timezone
 
@@ -7,6 +6,7 @@ from flask import (
     abort,
     current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -14,15 +14,21 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload, selectinload
 
+from .. import fastjson
 from ..extensions import db
-from ..models import AuditLog, ChatMessage, DiseaseResult, RagRetrieval, Report, Session
-from .generator import (
-    build_patient_report,
-    build_pharmacy_report,
-    render_report_pdf,
-    save_pdf,
+from ..models import (
+    AuditLog,
+    ChatMessage,
+    DiseaseResult,
+    ExtractedChunk,
+    RagRetrieval,
+    Report,
+    Session,
 )
+from .context import build_patient_report, build_pharmacy_report, context_hash
+from .tasks import expire_stale_render, submit_render
 
 reports_bp = Blueprint("reports", __name__, url_prefix="/reports")
 
@@ -48,11 +54,33 @@ def _own_report_or_404(report_id: int) -> Report:
     return r
 
 
-def _gather_session_data(s: Session) -> dict:
+def _gather_for_page(s: Session) -> dict:
+    """
+    What the report page shows: intake, the top 5 conditions, and whether
+    there's any chat — no messages or retrievals loaded.
+    """
+    intake = {f.field_name: f.field_value or "" for f in s.intake_fields.all()}
+    diseases = (
+        DiseaseResult.query.options(joinedload(DiseaseResult.disease))
+        .filter_by(session_id=s.id)
+        .order_by(DiseaseResult.rank)
+        .limit(5)
+        .all()
+    )
+    has_chat = db.session.query(
+        ChatMessage.query.filter_by(session_id=s.id).exists()
+    ).scalar()
+    return {"intake": intake, "diseases": diseases, "has_chat": has_chat}
+
+
+def _gather_for_render(s: Session) -> dict:
     """Gather all data needed to build any report type."""
     intake = {f.field_name: f.field_value or "" for f in s.intake_fields.all()}
+    # Catalog entries and cited chunks come with their rows, not one lazy
+    # SELECT per condition/citation when the reports read them
     diseases = (
-        DiseaseResult.query.filter_by(session_id=s.id)
+        DiseaseResult.query.options(joinedload(DiseaseResult.disease))
+        .filter_by(session_id=s.id)
         .order_by(DiseaseResult.rank)
         .all()
     )
@@ -65,9 +93,15 @@ def _gather_session_data(s: Session) -> dict:
     msg_ids = [m.id for m in chat_messages]
     retrievals = []
     if msg_ids:
-        retrievals = RagRetrieval.query.filter(
-            RagRetrieval.chat_message_id.in_(msg_ids)
-        ).all()
+        retrievals = (
+            RagRetrieval.query.options(
+                # Each cited chunk's text once, however often it's cited
+                selectinload(RagRetrieval.chunk).load_only(ExtractedChunk.chunk_text)
+            )
+            .filter(RagRetrieval.chat_message_id.in_(msg_ids))
+            .order_by(RagRetrieval.id)  # stable citation order
+            .all()
+        )
     return {
         "intake": intake,
         "diseases": diseases,
@@ -82,12 +116,62 @@ def _log_audit(user_id, session_id, event, detail):
             user_id=user_id,
             session_id=session_id,
             event_type=event,
-            event_detail=json.dumps(detail),
+            event_detail=detail,
             created_at=_utcnow(),
         )
     )
 
 
+def _new_report(s: Session, report_type: str, data: dict) -> Report | None:
+    """
+    Build a report context and add a pending Report for it (uncommitted).
+    Returns None when the latest report of that type already matches
+    (ready, or still within its render window).
+    """
+    builder = (
+        build_patient_report if report_type == "patient" else build_pharmacy_report
+    )
+    context = builder(
+        s,
+        data["intake"],
+        data["diseases"],
+        data["chat_messages"],
+        data["retrievals"],
+    )
+
+    # Every render of a session's report type writes the same file, so only
+    # the latest report's PDF is known to match its context
+    content_hash = context_hash(context)
+    latest = (
+        Report.query.filter_by(session_id=s.id, report_type=report_type)
+        .order_by(Report.generated_at.desc())
+        .first()
+    )
+    if latest is not None and latest.content_hash == content_hash:
+        # Already rendering (e.g. a double-submitted form), unless the render
+        # was lost with its worker — then it is failed and rendered afresh
+        if latest.status == "pending" and not expire_stale_render(latest):
+            return None
+        if latest.status == "ready" and latest.pdf_path and os.path.exists(
+            latest.pdf_path
+        ):
+            flash(
+                f"{report_type.capitalize()} report is already up to date.", "info"
+            )
+            return None
+
+    report = Report(
+        session_id=s.id,
+        report_type=report_type,
+        content_json=fastjson.dumps(context),
+        content_hash=content_hash,
+        status="pending",
+        generated_at=_utcnow(),
+    )
+    db.session.add(report)
+    return report
+
+
 # ── Report page ────────────────────────────────────────────────────────────────
 
 
@@ -95,7 +179,6 @@ def _log_audit(user_id, session_id, event, detail):
 @login_required
 def report_page(session_id):
     s = _own_session_or_404(session_id)
-    data = _gather_session_data(s)
 
     patient_report = (
         Report.query.filter_by(session_id=session_id, report_type="patient")
@@ -109,21 +192,30 @@ def report_page(session_id):
         .first()
     )
 
-    # Update session status
+    # Update session status and fail renders lost with their worker — before
+    # loading anything else, so the commit doesn't expire the loaded rows and
+    # send the template back for each
+    changed = [
+        expire_stale_render(r) for r in (patient_report, pharmacy_report) if r
+    ]
     if s.status not in ("report",):
         s.status = "report"
         s.updated_at = _utcnow()
+        changed.append(True)
+    if any(changed):
         db.session.commit()
 
+    data = _gather_for_page(s)
+
     return render_template(
         "reports/report.html",
         session=s,
         intake=data["intake"],
-        diseases=data["diseases"][:5],
+        diseases=data["diseases"],
         patient_report=patient_report,
         pharmacy_report=pharmacy_report,
-        has_diseases=len(data["diseases"]) > 0,
-        has_chat=len(data["chat_messages"]) > 0,
+        has_diseases=bool(data["diseases"]),
+        has_chat=data["has_chat"],
     )
 
 
@@ -148,7 +240,7 @@ def generate_report(session_id):
         )
         return redirect(url_for("reports.report_page", session_id=session_id))
 
-    data = _gather_session_data(s)
+    data = _gather_for_render(s)
 
     if not data["diseases"]:
         flash(
@@ -156,56 +248,50 @@ def generate_report(session_id):
         )
         return redirect(url_for("retrieve.results", session_id=session_id))
 
-    # ── Build report context ───────────────────────────────────────────────
-    if report_type == "patient":
-        context = build_patient_report(
-            s,
-            data["intake"],
-            data["diseases"],
-            data["chat_messages"],
-            data["retrievals"],
-        )
-    else:
-        context = build_pharmacy_report(
-            s,
-            data["intake"],
-            data["diseases"],
-            data["chat_messages"],
-            data["retrievals"],
-        )
+    report = _new_report(s, report_type, data)
+    if report is not None:
+        db.session.commit()
+        # ReportLab runs in the background; the report page polls for the outcome
+        submit_render(current_app._get_current_object(), report.id, current_user.id)
 
-    # ── Render PDF ─────────────────────────────────────────────────────────
-    try:
-        pdf_bytes = render_report_pdf(report_type, context)
-        upload_folder = current_app.config["UPLOAD_FOLDER"]
-        stored_path = save_pdf(pdf_bytes, session_id, report_type, upload_folder)
-    except Exception as e:
-        flash(f"PDF generation failed: {e}", "error")
-        return redirect(url_for("reports.report_page", session_id=session_id))
+    return redirect(url_for("reports.report_page", session_id=session_id))
 
-    # ── Save to DB ─────────────────────────────────────────────────────────
-    report = Report(
-        session_id=session_id,
-        report_type=report_type,
-        content_json=json.dumps(context),
-        pdf_path=stored_path,
-        generated_at=_utcnow(),
-    )
-    db.session.add(report)
-    _log_audit(
-        current_user.id,
-        session_id,
-        "report_generated",
-        {
-            "report_type": report_type,
-        },
-    )
-    db.session.commit()
 
-    flash(f"{report_type.capitalize()} report generated successfully.", "success")
+@reports_bp.route("/<int:session_id>/generate_all", methods=["POST"])
+@login_required
+def generate_all(session_id):
+    """Both report types from one gather, rendered side by side."""
+    s = _own_session_or_404(session_id)
+    data = _gather_for_render(s)
+
+    if not data["diseases"]:
+        flash(
+            "Please complete condition matching before generating a report.", "warning"
+        )
+        return redirect(url_for("retrieve.results", session_id=session_id))
+
+    # Pharmacy report stays off for sessions with a safety alert
+    report_types = ("patient",) if s.safety_flagged else ("patient", "pharmacy")
+    reports = [_new_report(s, report_type, data) for report_type in report_types]
+    reports = [r for r in reports if r is not None]
+    if reports:
+        db.session.commit()  # both rows or neither
+        app = current_app._get_current_object()
+        for report in reports:
+            submit_render(app, report.id, current_user.id)
+
     return redirect(url_for("reports.report_page", session_id=session_id))
 
 
+@reports_bp.route("/status/<int:report_id>")
+@login_required
+def status(report_id):
+    report = _own_report_or_404(report_id)
+    if expire_stale_render(report):
+        db.session.commit()
+    return jsonify({"status": report.status})
+
+
 # ── Download PDF ───────────────────────────────────────────────────────────────
 
 
@@ -213,6 +299,12 @@ def generate_report(session_id):
 @login_required
 def download_report(report_id):
     report = _own_report_or_404(report_id)
+    if expire_stale_render(report):
+        db.session.commit()
+
+    if report.status == "pending":
+        flash("The PDF is still being generated. Please try again shortly.", "warning")
+        return redirect(url_for("reports.report_page", session_id=report.session_id))
 
     if not report.pdf_path or not os.path.exists(report.pdf_path):
         flash("PDF file not found. Please regenerate the report.", "error")
@@ -230,9 +322,19 @@ def download_report(report_id):
     db.session.commit()
 
     filename = f"healthassist_{report.report_type}_report.pdf"
-    return send_file(
+    # Conditional (ETag/Last-Modified → 304, Range) with the file streamed
+    # through the server's file wrapper. The ETag stays werkzeug's
+    # mtime/size one rather than content_hash: a later render of the same
+    # report type replaces this file, and the PDF carries generated_at.
+    response = send_file(
         report.pdf_path,
         mimetype="application/pdf",
         as_attachment=True,
         download_name=filename,
+        conditional=True,
+        max_age=0,
     )
+    # Health data: the browser may keep a copy to revalidate, shared caches
+    # and proxies must not
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,151 @@
+"""
+app/reports/tasks.py
+
+Background PDF rendering for reports.
+A ReportLab build can hold a request for seconds, so generate_report
+stores the report context with status "pending", hands the render to a
+small in-process thread pool and redirects to the report page, which
+polls /reports/status/<id> until the PDF is ready.
+
+ReportLab is pure Python, so renders on those threads share one core.
+With REPORT_PROCESSES > 0 each thread hands its render to a process pool
+instead, and a patient + pharmacy pair really does build in parallel.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from .. import fastjson
+from ..extensions import db
+from ..models import AuditLog, Report
+
+_executor: ThreadPoolExecutor | None = None
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def expire_stale_render(report: Report) -> bool:
+    """
+    Mark a report failed if it has been pending for longer than
+    REPORT_STALE_SECONDS. Its render died with the process that ran it
+    (restart or deploy mid-render), so nothing else will finish it.
+    Every render is a new row, so generated_at is when it was queued.
+    Caller commits. Returns True if the report was marked failed.
+    """
+    if report.status != "pending":
+        return False
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(report.generated_at)
+    if age.total_seconds() < current_app.config.get("REPORT_STALE_SECONDS", 300):
+        return False
+    print(f"[reports] Report {report.id} stuck pending; failing")
+    report.status = "failed"
+    return True
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="reports"
+        )
+    return _executor
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Spawned, not forked: forking copies this process's other threads'
+        # locks (request threads, the embedder warm-up) in whatever state
+        _process_pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def submit_render(app, report_id: int, user_id: int):
+    """
+    Queue a pending report's PDF render.
+    With REPORT_WORKERS = 0 the render runs inline (useful for tests).
+    """
+    workers = app.config.get("REPORT_WORKERS", 2)
+    if workers <= 0:
+        _run(app, report_id, user_id)
+        return
+    _get_executor(workers).submit(_run, app, report_id, user_id)
+
+
+def _run(app, report_id: int, user_id: int):
+    with app.app_context():
+        try:
+            render_report(
+                report_id,
+                user_id,
+                app.config["UPLOAD_FOLDER"],
+                app.config.get("REPORT_PROCESSES", 0),
+            )
+        except Exception as e:
+            print(f"[reports] Rendering report {report_id} failed: {e}")
+            db.session.rollback()
+            report = db.session.get(Report, report_id)
+            if report is not None:
+                report.status = "failed"
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def render_report(
+    report_id: int, user_id: int, upload_folder: str, processes: int = 0
+):
+    """
+    Render the stored context to PDF, save it and mark the report ready.
+    With `processes` > 0 the ReportLab build runs in the process pool.
+    """
+    report = db.session.get(Report, report_id)
+    if report is None:
+        return
+
+    report.pdf_path = _save_pdf(
+        processes,
+        report.report_type,
+        fastjson.loads(report.content_json),
+        report.session_id,
+        upload_folder,
+    )
+    report.status = "ready"
+
+    db.session.add(
+        AuditLog(
+            user_id=user_id,
+            session_id=report.session_id,
+            event_type="report_generated",
+            event_detail={"report_type": report.report_type},
+            created_at=_utcnow(),
+        )
+    )
+    db.session.commit()
+
+
+def _save_pdf(processes: int, *args) -> str:
+    # ReportLab (~70 modules) is only needed here, so it loads on the first
+    # render rather than at app startup
+    from .generator import save_pdf
+
+    if processes <= 0:
+        return save_pdf(*args)
+    global _process_pool
+    try:
+        # The context is a plain dict, so it pickles straight across
+        return _get_process_pool(processes).submit(save_pdf, *args).result()
+    except BrokenProcessPool:
+        # A render process died (e.g. OOM-killed): render this one here and
+        # start a fresh pool for the next
+        print("[reports] Render process pool broke; rendering in-thread")
+        _process_pool = None
+        return save_pdf(*args)
@@ -0,0 +1,32 @@
+"""
+Per-view request body limits.
+MAX_CONTENT_LENGTH stays small app-wide; views that take bigger uploads
+(appointment audio) raise it for their own requests with
+@max_content_length. The limit has to be known once the URL is matched:
+CSRFProtect's app-wide before_request parses the form before any
+blueprint hook runs, and Flask 3.0's request.max_content_length has no
+setter.
+"""
+
+from flask import Request as FlaskRequest
+from flask import current_app
+
+
+def max_content_length(config_key: str):
+    """Let this view's requests be up to app.config[config_key] bytes."""
+
+    def decorate(view):
+        view.max_content_length_key = config_key
+        return view
+
+    return decorate
+
+
+class Request(FlaskRequest):
+    @property
+    def max_content_length(self) -> int | None:
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        config_key = getattr(view, "max_content_length_key", None)
+        if config_key is not None:
+            return current_app.config[config_key]
+        return super().max_content_length
@@ -1,4 +1,3 @@
-import json
 from datetime import datetime, timezone
 
 from flask import Blueprint, abort, flash, redirect, render_template, url_for
@@ -59,13 +58,7 @@ def results(session_id):
     # ── Prepare display data ───────────────────────────────────────────────
     display_results = []
     for dr in existing_results:
-        explanation = {}
-        if dr.explanation_json:
-            try:
-                explanation = json.loads(dr.explanation_json)
-            except (json.JSONDecodeError, TypeError):
-                explanation = {}
-
+        explanation = dr.explanation_json or {}
         display_results.append(
             {
                 "rank": dr.rank,
@@ -144,7 +137,7 @@ def _run_retrieval(
             disease_id=match["disease_id"],
             rank=match["rank"],
             similarity_score=match["similarity_score"],
-            explanation_json=json.dumps(explanation),
+            explanation_json=explanation,
             created_at=datetime.now(timezone.utc).isoformat(),
         )
         db.session.add(dr)
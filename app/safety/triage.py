@@ -109,10 +109,11 @@ def check_safety(text: str) -> dict:
     }
 
 
-def is_retrieval_sufficient(retrieved_chunks: list[dict]) -> bool:
+def is_retrieval_sufficient(retrieved_chunks: list) -> bool:
+    """`retrieved_chunks` are vector_store.RetrievalResult objects."""
     if not retrieved_chunks:
         return False
-    return any(c["score"] >= MIN_RETRIEVAL_SCORE for c in retrieved_chunks)
+    return any(c.score >= MIN_RETRIEVAL_SCORE for c in retrieved_chunks)
 
 
 def check_intake_safety(intake_fields: dict) -> dict:
@@ -1,4 +1,3 @@
-import json
 import os
 from datetime import datetime, timezone
 
@@ -19,6 +18,7 @@ from ..models import (
     Upload,
     User,
 )
+from ..user_cache import forget_user
 from .forms import PharmacySettingsForm
 
 settings_bp = Blueprint("settings", __name__, url_prefix="/settings")
@@ -34,11 +34,8 @@ def get_pharmacy_settings(user_id: int) -> dict:
         .order_by(AuditLog.id.desc())
         .first()
     )
-    if row:
-        try:
-            return json.loads(row.event_detail)
-        except Exception:
-            pass
+    if row and isinstance(row.event_detail, dict):
+        return row.event_detail
     return {
         "pharmacy_name": "",
         "pharmacy_email": "",
@@ -63,7 +60,7 @@ def settings():
                 user_id=current_user.id,
                 session_id=None,
                 event_type="pharmacy_settings_saved",
-                event_detail=json.dumps(detail),
+                event_detail=detail,
                 created_at=_utcnow(),
             )
         )
@@ -139,6 +136,7 @@ def delete_account():
     logout_user()
     db.session.delete(user)
     db.session.commit()
+    forget_user(user_id)
 
     flash(
         "Your account and all associated data have been permanently deleted.",
@@ -10,18 +10,19 @@ Sentence transformers give semantic matching so "chest pain" matches
 """
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
 from ..models import DiseaseCatalog
 
 # ── Singleton model (shared with RAG to avoid loading twice) ──────────────────
-_model: SentenceTransformer | None = None
+_model = None
 
 
-def get_model() -> SentenceTransformer:
+def get_model():
     global _model
     if _model is None:
+        from sentence_transformers import SentenceTransformer
+
         print("[TwoTower] Loading sentence transformer model...")
         _model = SentenceTransformer("all-MiniLM-L6-v2")
         print("[TwoTower] Model loaded.")
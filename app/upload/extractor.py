@@ -3,6 +3,7 @@ PDF text extraction and chunking.
 Uses PyMuPDF (fitz) as primary extractor with pypdf as fallback.
 """
 
+import io
 import os
 import uuid
 
@@ -24,7 +25,8 @@ def save_upload(
 ) -> dict:
     """
     Validate and save an uploaded FileStorage object.
-    Returns dict with stored_path, original_name, file_size_bytes, mime_type.
+    Returns dict with stored_path, original_name, file_size_bytes, mime_type
+    and data (the PDF bytes, so extraction needn't read the file back).
     Raises ValueError on validation failure.
     """
     original_name = secure_filename(file_storage.filename)
@@ -49,33 +51,39 @@ def save_upload(
 
     stored_filename = f"{uuid.uuid4().hex}.pdf"
     stored_path = os.path.join(dest_dir, stored_filename)
-    file_storage.save(stored_path)
+    data = file_storage.read()
+    with open(stored_path, "wb") as f:
+        f.write(data)
 
     return {
         "original_name": original_name,
         "stored_path": stored_path,
         "file_size_bytes": size,
         "mime_type": "application/pdf",
+        "data": data,
     }
 
 
 # ── Text extraction ────────────────────────────────────────────────────────────
 
 
-def extract_text_from_pdf(stored_path: str) -> str:
+def extract_text_from_pdf(source: str | bytes) -> str:
     """
-    Extract raw text from a PDF file.
+    Extract raw text from a PDF file path or the PDF's bytes.
     Tries PyMuPDF first; falls back to pypdf if output is empty.
     """
-    text = _extract_with_pymupdf(stored_path)
+    text = _extract_with_pymupdf(source)
     if not text.strip():
-        text = _extract_with_pypdf(stored_path)
+        text = _extract_with_pypdf(source)
     return text.strip()
 
 
-def _extract_with_pymupdf(path: str) -> str:
+def _extract_with_pymupdf(source: str | bytes) -> str:
     try:
-        doc = fitz.open(path)
+        if isinstance(source, bytes):
+            doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            doc = fitz.open(source)
         pages = []
         for page in doc:
             pages.append(page.get_text())
@@ -85,9 +93,11 @@ def _extract_with_pymupdf(path: str) -> str:
         return ""
 
 
-def _extract_with_pypdf(path: str) -> str:
+def _extract_with_pypdf(source: str | bytes) -> str:
     try:
-        reader = PdfReader(path)
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        reader = PdfReader(source)
         pages = []
         for page in reader.pages:
             t = page.extract_text()
@@ -128,10 +138,10 @@ def chunk_text(
     return chunks
 
 
-def extract_and_chunk(stored_path: str) -> list[str]:
+def extract_and_chunk(source: str | bytes) -> list[str]:
     """
-    Full pipeline: extract text from PDF then chunk it.
+    Full pipeline: extract text from PDF (path or bytes) then chunk it.
     Returns list of chunk strings (may be empty if PDF has no text).
     """
-    text = extract_text_from_pdf(stored_path)
+    text = extract_text_from_pdf(source)
     return chunk_text(text)
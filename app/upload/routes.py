@@ -5,6 +5,7 @@ from flask_login import current_user, login_required
 
 from ..extensions import db
 from ..models import ExtractedChunk, Session
+from ..rag.tasks import get_session_chunks, submit_index_build
 
 upload_bp = Blueprint("upload", __name__, url_prefix="/upload")
 
@@ -65,6 +66,12 @@ def review(session_id):
         s.updated_at = _utcnow()
         db.session.commit()
 
+        # Start embedding the confirmed text now, so the index is ready
+        # (or nearly) by the first chat question
+        chunk_texts = get_session_chunks(session_id)[0]
+        if chunk_texts:
+            submit_index_build(session_id, chunk_texts)
+
         flash(f"{updated} chunk(s) confirmed. Running condition matching…", "success")
         return redirect(url_for("retrieve.results", session_id=session_id))
 
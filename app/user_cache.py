@@ -0,0 +1,64 @@
+"""
+Short-lived cache of User rows for Flask-Login's user_loader.
+load_user runs on every authenticated request; caching the row's columns
+for a few seconds saves the SELECT on hot users. Whole ORM objects can't
+be shared across requests (they expire on commit and detach when the
+request's session closes), so only column values are kept and a detached
+User is rebuilt from them and merged without a query.
+
+The cache is per process. forget_user only clears the calling process, so
+other gunicorn workers can keep serving a changed or deleted user's old
+row for up to USER_CACHE_TTL seconds — keep the TTL short.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from .extensions import db
+from .models import User
+
+USER_CACHE_SIZE = 2048
+USER_CACHE_TTL = 10  # seconds
+
+# LRU order, oldest first; shared by the request threads, so under _lock
+_cache: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+_lock = threading.Lock()
+_COLUMNS = tuple(c.key for c in User.__table__.columns)
+
+
+def get_user(user_id: int) -> User | None:
+    """Return the user (attached to the current db session), or None."""
+    with _lock:
+        hit = _cache.get(user_id)
+        if hit is not None and hit[0] > time.monotonic():
+            _cache.move_to_end(user_id)
+        else:
+            hit = None
+    if hit is not None:
+        user = User(**hit[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        forget_user(user_id)
+        return None
+    row = {key: getattr(user, key) for key in _COLUMNS}
+    with _lock:
+        _cache[user_id] = (time.monotonic() + USER_CACHE_TTL, row)
+        _cache.move_to_end(user_id)
+        while len(_cache) > USER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return user
+
+
+def forget_user(user_id: int):
+    """
+    Drop a cached user — call after changing or deleting the row.
+    Only this process's cache; see the module docstring.
+    """
+    with _lock:
+        _cache.pop(user_id, None)
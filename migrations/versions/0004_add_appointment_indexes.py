@@ -0,0 +1,24 @@
+"""Add composite indexes for appointment list and action lookups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_appt_session_created', 'appointments',
+                    ['session_id', 'created_at'])
+    op.create_index('ix_action_appt_type', 'appointment_actions',
+                    ['appointment_id', 'action_type'])
+
+
+def downgrade():
+    op.drop_index('ix_action_appt_type', 'appointment_actions')
+    op.drop_index('ix_appt_session_created', 'appointments')
@@ -0,0 +1,34 @@
+"""Store summaries and audit details as JSON columns
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing values were always written with json.dumps, so they cast cleanly
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.alter_column('summary_json', type_=sa.JSON(),
+                              existing_type=sa.Text(), existing_nullable=True,
+                              postgresql_using='summary_json::json')
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('event_detail', type_=sa.JSON(),
+                              existing_type=sa.Text(), existing_nullable=True,
+                              postgresql_using='event_detail::json')
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('event_detail', type_=sa.Text(),
+                              existing_type=sa.JSON(), existing_nullable=True)
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.alter_column('summary_json', type_=sa.Text(),
+                              existing_type=sa.JSON(), existing_nullable=True)
@@ -0,0 +1,25 @@
+"""Track pharmacy email delivery on reports
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(sa.Column('email_status', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('email_error', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('email_error')
+        batch_op.drop_column('email_status')
@@ -0,0 +1,22 @@
+"""Add (user_id, created_at DESC) index for the session lists
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_sessions_user_created', 'sessions',
+                    ['user_id', sa.text('created_at DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_sessions_user_created', 'sessions')
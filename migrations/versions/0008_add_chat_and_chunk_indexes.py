@@ -0,0 +1,24 @@
+"""Add composite indexes for per-session chat and chunk reads
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_chat_session_created', 'chat_messages',
+                    ['session_id', 'created_at'])
+    op.create_index('ix_chunk_session_index', 'extracted_chunks',
+                    ['session_id', 'chunk_index'])
+
+
+def downgrade():
+    op.drop_index('ix_chunk_session_index', 'extracted_chunks')
+    op.drop_index('ix_chat_session_created', 'chat_messages')
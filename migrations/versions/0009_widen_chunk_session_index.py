@@ -0,0 +1,26 @@
+"""Index confirmed chunks per session in read order
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Chat reads only confirmed chunks; the wider index also serves
+    # every session_id-prefixed lookup the old one did
+    op.drop_index('ix_chunk_session_index', 'extracted_chunks')
+    op.create_index('ix_chunk_session_confirmed', 'extracted_chunks',
+                    ['session_id', 'is_confirmed', 'chunk_index'])
+
+
+def downgrade():
+    op.drop_index('ix_chunk_session_confirmed', 'extracted_chunks')
+    op.create_index('ix_chunk_session_index', 'extracted_chunks',
+                    ['session_id', 'chunk_index'])
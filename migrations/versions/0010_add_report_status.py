@@ -0,0 +1,26 @@
+"""Track background PDF rendering on reports
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Reports from before this revision were rendered in the request
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(
+            sa.Column('status', sa.Text(), nullable=False, server_default='ready')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('status')
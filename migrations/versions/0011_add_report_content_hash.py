@@ -0,0 +1,23 @@
+"""Hash report contents so unchanged reports are not re-rendered
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,27 @@
+"""Store disease match explanations as a JSON column
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing values were always written with json.dumps, so they cast cleanly
+    with op.batch_alter_table('disease_results') as batch_op:
+        batch_op.alter_column('explanation_json', type_=sa.JSON(),
+                              existing_type=sa.Text(), existing_nullable=True,
+                              postgresql_using='explanation_json::json')
+
+
+def downgrade():
+    with op.batch_alter_table('disease_results') as batch_op:
+        batch_op.alter_column('explanation_json', type_=sa.Text(),
+                              existing_type=sa.JSON(), existing_nullable=True)
@@ -0,0 +1,23 @@
+"""Record when a pharmacy email was queued
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(sa.Column('email_queued_at', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('email_queued_at')
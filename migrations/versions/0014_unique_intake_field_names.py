@@ -0,0 +1,27 @@
+"""Make (session_id, field_name) unique on intake_fields
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The intake upsert's ON CONFLICT needs this index. Older saves could
+    # race each other into duplicate rows; keep the newest of each
+    op.execute(
+        'DELETE FROM intake_fields WHERE id NOT IN ('
+        'SELECT MAX(id) FROM intake_fields GROUP BY session_id, field_name)'
+    )
+    op.create_index('uq_intake_session_field', 'intake_fields',
+                    ['session_id', 'field_name'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_intake_session_field', 'intake_fields')
@@ -0,0 +1,41 @@
+"""
+One-time export of the chat embedding model (all-MiniLM-L6-v2) to ONNX
+with int8 dynamic quantisation, for app/rag/vector_store.py's EMBED_ONNX_DIR.
+
+Needs the export tooling, which the app itself does not:
+    pip install "optimum[onnxruntime]"
+
+Usage:
+    python scripts/export_onnx_embedder.py [output_dir]
+"""
+import os
+import sys
+
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "models", "minilm-onnx")
+    )
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {MODEL_ID} → {out_dir}")
+    ORTModelForFeatureExtraction.from_pretrained(MODEL_ID, export=True).save_pretrained(
+        out_dir
+    )
+    AutoTokenizer.from_pretrained(MODEL_ID).save_pretrained(out_dir)
+
+    quantize_dynamic(
+        os.path.join(out_dir, "model.onnx"),
+        os.path.join(out_dir, "model_quantized.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+    print(f"✅ Done. Set EMBED_ONNX_DIR={out_dir} and install onnxruntime.")
+
+
+if __name__ == "__main__":
+    main()
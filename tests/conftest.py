@@ -1,4 +1,6 @@
 import os
+import uuid
+
 import pytest
 
 # Point to test DB before any app import
@@ -8,4 +10,43 @@ os.environ.setdefault(
 )
 os.environ.setdefault('SECRET_KEY', 'test-secret-key')
 os.environ.setdefault('FLASK_ENV', 'development')
-os.environ.setdefault('UPLOAD_FOLDER', 'app/uploads')
\ No newline at end of file
+os.environ.setdefault('UPLOAD_FOLDER', 'app/uploads')
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    application = create_app('development')
+    application.config['TESTING'] = True
+    application.config['WTF_CSRF_ENABLED'] = False
+    yield application
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_client(client):
+    """A test client signed up (and so logged in) as a fresh user."""
+    client.post('/auth/signup', data={
+        'email':            f'test-{uuid.uuid4().hex}@example.com',
+        'password':         'TestPass123',
+        'confirm_password': 'TestPass123',
+    })
+    return client
+
+
+@pytest.fixture
+def new_session(user_client):
+    """Create a session owned by user_client's user; returns its id."""
+    def create(title='Test session'):
+        r = user_client.post('/sessions/new', data={'title': title})
+        return int(r.headers['Location'].rstrip('/').split('/')[-1])
+    return create
+
+
+@pytest.fixture
+def session_id(new_session):
+    return new_session()
@@ -0,0 +1,59 @@
+"""
+Buffered audit rows — written with the commit they record, dropped on rollback.
+"""
+import uuid
+
+import pytest
+from flask import g
+
+from app.appointments import routes as appointment_routes
+from app.extensions import db
+from app.models import Appointment, AuditLog, User
+
+
+def _buffer_audit_row():
+    """Buffer one row with a unique event type; returns the event type."""
+    user = User(email=f'audit-{uuid.uuid4().hex}@example.com', pw_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    event = f'test-{uuid.uuid4().hex}'
+    g.audit_buf = [{
+        'user_id': user.id, 'session_id': None, 'event_type': event,
+        'event_detail': {}, 'created_at': '2026-10-15T00:00:00+00:00',
+    }]
+    return event
+
+
+def test_buffer_is_written_with_the_commit(app):
+    with app.app_context():
+        event = _buffer_audit_row()
+        db.session.commit()
+        assert 'audit_buf' not in g
+        assert AuditLog.query.filter_by(event_type=event).count() == 1
+
+
+def test_buffer_is_dropped_on_rollback(app):
+    with app.app_context():
+        event = _buffer_audit_row()
+        db.session.rollback()
+        db.session.commit()
+        assert AuditLog.query.filter_by(event_type=event).count() == 0
+
+
+def test_audit_survives_a_failure_after_the_commit(
+    app, user_client, session_id, monkeypatch
+):
+    def broken_enqueue(appt, transcribe):
+        raise RuntimeError('worker pool unavailable')
+
+    monkeypatch.setattr(appointment_routes, '_enqueue', broken_enqueue)
+    with pytest.raises(RuntimeError):
+        user_client.post(f'/appointments/session/{session_id}/manual', data={
+            'notes': 'Doctor advised rest and fluids for the next few days.',
+        })
+
+    with app.app_context():
+        assert Appointment.query.filter_by(session_id=session_id).count() == 1
+        assert AuditLog.query.filter_by(
+            session_id=session_id, event_type='appointment_created'
+        ).count() == 1
@@ -0,0 +1,97 @@
+"""
+Background jobs — run inline with *_WORKERS = 0, and rows stuck in flight
+after a lost worker are failed.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Appointment, AppointmentAction, Report
+
+
+@pytest.fixture(autouse=True)
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+def _ago(seconds):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+
+def test_appointment_runs_inline_without_workers(
+    app, user_client, session_id, monkeypatch
+):
+    from app.appointments import tasks
+
+    app.config['APPOINTMENT_WORKERS'] = 0
+    monkeypatch.setattr(tasks, 'summarise', lambda text, lang: {
+        'success': True,
+        'error': None,
+        'summary': {
+            'what_doctor_said': 'Rest and fluids.',
+            'warning_signs': ['Fever above 39C'],
+            'followup_date': '2026-11-01',
+        },
+    })
+
+    r = user_client.post(f'/appointments/session/{session_id}/manual', data={
+        'notes': 'Doctor advised rest and fluids; come back if the fever rises.',
+    })
+    appt_id = int(r.headers['Location'].rstrip('/').split('/')[-1])
+
+    # Already processed by the time the capture request returns
+    assert user_client.get(f'/appointments/{appt_id}/status').get_json() == {
+        'status': 'done'
+    }
+    actions = AppointmentAction.query.filter_by(appointment_id=appt_id).all()
+    assert sorted(a.action_type for a in actions) == ['followup', 'warning']
+
+
+def test_stuck_appointment_is_failed(app):
+    from app.appointments.tasks import expire_stale
+
+    app.config['APPOINTMENT_STALE_SECONDS'] = 600
+    running = Appointment(status='transcribing', created_at=_ago(60))
+    stuck = Appointment(status='summarising', created_at=_ago(601))
+    done = Appointment(status='done', created_at=_ago(601))
+
+    assert not expire_stale(running)
+    assert running.status == 'transcribing'
+    assert expire_stale(stuck)
+    assert stuck.status == 'failed'
+    assert not expire_stale(done)
+    assert done.status == 'done'
+
+
+def test_stuck_email_is_failed(app):
+    from app.email.tasks import expire_stale_send
+
+    app.config['EMAIL_STALE_SECONDS'] = 300
+    sending = Report(email_status='sending', email_queued_at=_ago(30))
+    stuck = Report(email_status='sending', email_queued_at=_ago(301))
+    # Queued before the timestamp was recorded
+    legacy = Report(email_status='sending')
+
+    assert not expire_stale_send(sending)
+    assert sending.email_status == 'sending'
+    for report in (stuck, legacy):
+        assert expire_stale_send(report)
+        assert report.email_status == 'failed'
+        assert report.email_error
+
+
+def test_stuck_report_render_is_failed(app):
+    from app.reports.tasks import expire_stale_render
+
+    app.config['REPORT_STALE_SECONDS'] = 300
+    rendering = Report(status='pending', generated_at=_ago(30))
+    stuck = Report(status='pending', generated_at=_ago(301))
+    ready = Report(status='ready', generated_at=_ago(301))
+
+    assert not expire_stale_render(rendering)
+    assert rendering.status == 'pending'
+    assert expire_stale_render(stuck)
+    assert stuck.status == 'failed'
+    assert not expire_stale_render(ready)
+    assert ready.status == 'ready'
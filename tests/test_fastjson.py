@@ -0,0 +1,26 @@
+"""
+JSON helpers — pre-encoded fragments concatenate into valid request bodies.
+"""
+import json
+
+from app import fastjson
+from app.appointments import summariser
+
+
+def test_fragments_concatenate():
+    parts = ['Line one\n', 'quotes " and \\ backslash', ' नमस्ते\t']
+    body = b'"' + b''.join(fastjson.fragment(p) for p in parts) + b'"'
+    assert json.loads(body) == ''.join(parts)
+
+
+def test_summariser_request_body_is_valid_json():
+    _, head, tail = summariser._prompt_parts('en')
+    notes = 'Patient said "it hurts"\nC:\\notes'
+    body = b''.join((
+        summariser._BODY_PREFIX, head, fastjson.fragment(notes), tail, b'"}',
+    ))
+    payload = json.loads(body)
+    assert payload['model'] == summariser.OLLAMA_MODEL
+    assert payload['stream'] is True
+    assert notes in payload['prompt']
+    assert payload['prompt'].endswith('Assistant:')
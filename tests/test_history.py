@@ -0,0 +1,34 @@
+"""
+History page — per-session counts come from one correlated query.
+"""
+from app.extensions import db
+from app.history import routes as history_routes
+from app.models import ChatMessage, Report
+
+
+def test_counts_belong_to_each_session(
+    app, user_client, new_session, monkeypatch
+):
+    busy, quiet = new_session('Busy'), new_session('Quiet')
+    with app.app_context():
+        db.session.add_all([
+            ChatMessage(session_id=busy, role='user', content='Hi'),
+            ChatMessage(session_id=busy, role='assistant', content='Hello'),
+            Report(session_id=busy, report_type='patient', content_json='{}'),
+        ])
+        db.session.commit()
+
+    rendered = {}
+    monkeypatch.setattr(
+        history_routes, 'render_template',
+        lambda template, **context: rendered.update(context) or '',
+    )
+    assert user_client.get('/history/').status_code == 200
+
+    stats = {s['session'].id: s for s in rendered['session_stats']}
+    assert set(stats) == {busy, quiet}
+    assert stats[busy]['message_count'] == 2
+    assert stats[busy]['report_count'] == 1
+    assert stats[quiet]['message_count'] == 0
+    assert stats[quiet]['report_count'] == 0
+    assert stats[busy]['disease_count'] == stats[quiet]['upload_count'] == 0
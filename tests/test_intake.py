@@ -0,0 +1,71 @@
+"""
+Intake form — saving again updates the existing field rows in place,
+on the schema the migrations build as well as the models'.
+"""
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app.extensions import db
+from app.intake.routes import _upsert_intake_fields
+from app.models import IntakeField
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+def test_resubmitted_intake_updates_fields(app, user_client, session_id):
+    form = {
+        'age':             '42',
+        'sex':             'female',
+        'chief_complaint': 'Persistent cough',
+        'duration':        '3 days',
+    }
+    user_client.post(f'/intake/{session_id}', data=form)
+    user_client.post(f'/intake/{session_id}', data={**form, 'duration': '2 weeks'})
+
+    with app.app_context():
+        fields = {
+            f.field_name: f.field_value
+            for f in IntakeField.query.filter_by(session_id=session_id)
+        }
+        assert IntakeField.query.filter_by(session_id=session_id).count() == len(fields)
+    assert fields['duration'] == '2 weeks'
+    assert fields['chief_complaint'] == 'Persistent cough'
+    assert len(fields) == 7
+
+
+@pytest.fixture
+def migrated_app(tmp_path, monkeypatch):
+    """An app on a fresh SQLite file, to be built by the migrations."""
+    from app import config, create_app
+    monkeypatch.setattr(
+        config.DevelopmentConfig, 'SQLALCHEMY_DATABASE_URI',
+        f"sqlite:///{tmp_path / 'migrated.db'}",
+    )
+    application = create_app('development')
+    with application.app_context():
+        yield application
+
+
+def test_upsert_on_the_migrated_schema(migrated_app):
+    upgrade(directory=MIGRATIONS, revision='0013')
+    # Duplicates the old per-field saves could leave behind
+    db.session.add_all([
+        IntakeField(session_id=1, field_name='duration', field_value=value,
+                    created_at='2026-10-15T00:00:00+00:00')
+        for value in ('3 days', '4 days')
+    ])
+    db.session.commit()
+
+    upgrade(directory=MIGRATIONS)
+    rows = IntakeField.query.filter_by(session_id=1).all()
+    assert [(r.field_name, r.field_value) for r in rows] == [('duration', '4 days')]
+
+    _upsert_intake_fields(1, {'duration': '2 weeks', 'age': '42'})
+    db.session.commit()
+    fields = {
+        f.field_name: f.field_value
+        for f in IntakeField.query.filter_by(session_id=1)
+    }
+    assert fields == {'duration': '2 weeks', 'age': '42'}
@@ -0,0 +1,61 @@
+"""
+Password hashing — argon2id by default, older hashes upgraded on login.
+"""
+import uuid
+
+import pytest
+
+from app import passwords
+from app.extensions import db
+from app.models import User
+
+LEGACY_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture(autouse=True)
+def argon2_configured(app):
+    app.config['PASSWORD_HASH_METHOD'] = passwords.ARGON2
+
+
+def test_argon2_round_trip(app):
+    pytest.importorskip('argon2')
+    with app.app_context():
+        pw_hash = passwords.hash_password('TestPass123')
+        assert pw_hash.startswith('$argon2id$')
+        assert passwords.verify_password(pw_hash, 'TestPass123')
+        assert not passwords.verify_password(pw_hash, 'WrongPass123')
+        assert not passwords.needs_rehash(pw_hash)
+
+
+def test_older_hashes_still_verify_but_need_rehash(app):
+    with app.app_context():
+        app.config['PASSWORD_HASH_METHOD'] = LEGACY_METHOD
+        legacy = passwords.hash_password('TestPass123')
+        assert not passwords.needs_rehash(legacy)
+
+        app.config['PASSWORD_HASH_METHOD'] = passwords.ARGON2
+        assert passwords.verify_password(legacy, 'TestPass123')
+        assert not passwords.verify_password(legacy, 'WrongPass123')
+        assert passwords.needs_rehash(legacy)
+
+
+def test_login_upgrades_an_older_hash(app, client):
+    email = f'rehash-{uuid.uuid4().hex}@example.com'
+    with app.app_context():
+        app.config['PASSWORD_HASH_METHOD'] = LEGACY_METHOD
+        user = User(email=email)
+        user.set_password('TestPass123')
+        app.config['PASSWORD_HASH_METHOD'] = passwords.ARGON2
+        db.session.add(user)
+        db.session.commit()
+
+    r = client.post('/auth/login', data={
+        'email':    email,
+        'password': 'TestPass123',
+    })
+    assert r.status_code == 302
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        assert not user.needs_rehash()
+        assert user.check_password('TestPass123')
@@ -0,0 +1,73 @@
+"""
+Report generation — unchanged reports aren't rendered twice, lost ones are.
+"""
+import uuid
+
+import pytest
+
+from app.extensions import db
+from app.models import DiseaseCatalog, DiseaseResult, Report
+
+
+@pytest.fixture(autouse=True)
+def render_inline(app, tmp_path):
+    app.config['REPORT_WORKERS'] = 0
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+
+
+@pytest.fixture
+def matched_session(app, session_id):
+    """session_id, with a condition match so reports can be generated."""
+    with app.app_context():
+        disease = DiseaseCatalog(
+            disease_name=f'Test condition {uuid.uuid4().hex[:8]}',
+            icd_code='X00', short_desc='For report tests.',
+        )
+        db.session.add(disease)
+        db.session.flush()
+        db.session.add(DiseaseResult(
+            session_id=session_id, disease_id=disease.id, rank=1,
+            similarity_score=0.5, explanation_json={'matching_phrases': []},
+        ))
+        db.session.commit()
+    return session_id
+
+
+def _generate_patient_report(client, sid, **kwargs):
+    return client.post(
+        f'/reports/{sid}/generate', data={'report_type': 'patient'}, **kwargs
+    )
+
+
+def _reports(app, sid):
+    with app.app_context():
+        return [
+            (r.id, r.status)
+            for r in Report.query.filter_by(session_id=sid).order_by(Report.id)
+        ]
+
+
+def test_unchanged_report_is_not_rendered_again(app, user_client, matched_session):
+    _generate_patient_report(user_client, matched_session)
+    first = _reports(app, matched_session)
+    assert [status for _, status in first] == ['ready']
+
+    r = _generate_patient_report(user_client, matched_session, follow_redirects=True)
+    assert b'already up to date' in r.data
+    assert _reports(app, matched_session) == first
+
+
+def test_report_stuck_pending_is_rendered_again(app, user_client, matched_session):
+    _generate_patient_report(user_client, matched_session)
+    with app.app_context():
+        # As if the process rendering it died an hour ago
+        report = Report.query.filter_by(session_id=matched_session).one()
+        report.status = 'pending'
+        report.generated_at = '2020-01-01T00:00:00+00:00'
+        db.session.commit()
+        stuck_id = report.id
+
+    _generate_patient_report(user_client, matched_session)
+    reports = _reports(app, matched_session)
+    assert reports[0] == (stuck_id, 'failed')
+    assert [status for _, status in reports[1:]] == ['ready']
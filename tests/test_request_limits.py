@@ -0,0 +1,27 @@
+"""
+Request size limits — 10 MB app-wide, 50 MB for appointment audio uploads.
+"""
+import io
+
+ELEVEN_MB = 11 * 1024 * 1024
+
+
+def test_large_bodies_are_rejected_app_wide(user_client, session_id):
+    r = user_client.post(f'/intake/{session_id}', data={
+        'pdf_file': (io.BytesIO(b'\0' * ELEVEN_MB), 'big.pdf'),
+    })
+    assert r.status_code == 413
+
+
+def test_audio_upload_accepts_more(user_client, session_id, monkeypatch):
+    from app.appointments import routes
+
+    saved = []
+    monkeypatch.setattr(routes, '_save_audio', lambda f, path: saved.append(path))
+    monkeypatch.setattr(routes, '_enqueue', lambda appt, transcribe: None)
+    r = user_client.post(f'/appointments/session/{session_id}/upload', data={
+        'audio_file': (io.BytesIO(b'\0' * ELEVEN_MB), 'visit.mp3'),
+    })
+    assert r.status_code == 302
+    assert '/appointments/' in r.headers['Location']
+    assert len(saved) == 1
@@ -0,0 +1,66 @@
+"""
+Appointment summariser — repeat notes are served from the summary cache,
+and JSON wrapped in model chatter is recovered.
+"""
+import json
+
+import pytest
+
+from app.appointments import summariser
+
+NOTES = 'Take amoxicillin 500 mg three times a day for a week.'
+
+
+@pytest.fixture
+def generate(monkeypatch):
+    """Stand-in for Ollama: returns `generate.reply`, records each prompt."""
+    def fake(prompt):
+        fake.prompts.append(prompt)
+        return fake.reply
+
+    fake.prompts = []
+    fake.reply = '{"what_doctor_said": "Antibiotics for a week."}'
+    monkeypatch.setattr(summariser, '_generate', fake)
+    monkeypatch.setattr(summariser, '_summary_cache', type(summariser._summary_cache)())
+    return fake
+
+
+def test_repeat_notes_skip_the_model(generate):
+    first = summariser.summarise(NOTES, lang='en')
+    second = summariser.summarise(NOTES, lang='en')
+    assert first == second
+    assert second['summary'] == {'what_doctor_said': 'Antibiotics for a week.'}
+    assert len(generate.prompts) == 1
+
+    # Another language is another prompt, so another call
+    summariser.summarise(NOTES, lang='hi')
+    assert len(generate.prompts) == 2
+
+
+def test_cached_summary_cannot_be_mutated_by_callers(generate):
+    summariser.summarise(NOTES, lang='en')['summary']['medications'] = ['x']
+    assert 'medications' not in summariser.summarise(NOTES, lang='en')['summary']
+
+
+@pytest.mark.parametrize('raw', [
+    '{"followup_date": "2026-11-01"}',
+    'Sure! Here is the summary: {"followup_date": "2026-11-01"} Hope this helps',
+    # A stray brace after the object defeats the first-{/last-} slice
+    'Summary: {"followup_date": "2026-11-01"} (see {notes}',
+])
+def test_parse_summary_recovers_wrapped_objects(raw):
+    assert summariser._parse_summary(raw) == {'followup_date': '2026-11-01'}
+
+
+def test_largest_balanced_object_ignores_braces_in_strings():
+    raw = 'x {"a": "}{"} y {"b": {"c": "\\"}"}} z'
+    start, end = summariser._largest_balanced_object(raw)
+    assert json.loads(raw[start:end]) == {'b': {'c': '"}'}}
+
+
+def test_unrecoverable_output_falls_back(generate):
+    generate.reply = 'I could not summarise these notes.'
+    result = summariser.summarise(NOTES, lang='en')
+    assert result['success']
+    assert result['summary']['what_doctor_said'] == generate.reply
+    assert result['summary']['medications'] == []
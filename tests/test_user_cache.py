@@ -0,0 +1,52 @@
+"""
+User cache — hits are served from memory in LRU order, forget drops them.
+"""
+import uuid
+
+import pytest
+
+from app import user_cache
+from app.extensions import db
+from app.models import User
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(app, monkeypatch):
+    monkeypatch.setattr(user_cache, '_cache', type(user_cache._cache)())
+    with app.app_context():
+        yield
+
+
+def _new_user():
+    user = User(email=f'cache-{uuid.uuid4().hex}@example.com', pw_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_hit_is_attached_to_the_request_session(app):
+    uid = _new_user()
+    db.session.remove()
+    email = user_cache.get_user(uid).email
+    db.session.remove()
+
+    user = user_cache.get_user(uid)
+    assert user.email == email
+    assert user in db.session
+
+
+def test_hits_keep_users_in_the_cache(app, monkeypatch):
+    monkeypatch.setattr(user_cache, 'USER_CACHE_SIZE', 2)
+    a, b, c = _new_user(), _new_user(), _new_user()
+    user_cache.get_user(a)
+    user_cache.get_user(b)
+    user_cache.get_user(a)  # a is now the most recently used
+    user_cache.get_user(c)
+    assert list(user_cache._cache) == [a, c]
+
+
+def test_forget_user_drops_the_cached_row(app):
+    uid = _new_user()
+    user_cache.get_user(uid)
+    user_cache.forget_user(uid)
+    assert uid not in user_cache._cache
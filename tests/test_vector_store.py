@@ -0,0 +1,77 @@
+"""
+Index builds — repeated chunks fold, same-template pages don't.
+"""
+import zlib
+
+import numpy as np
+import pytest
+
+from app.rag import vector_store
+
+
+def _fake_encode(texts, batch_size=None):
+    # Deterministic per text; the real model isn't needed to test indexing
+    vecs = np.stack([
+        np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16)
+        for t in texts
+    ]).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(vector_store, '_encode', _fake_encode)
+    monkeypatch.setattr(vector_store, 'INDEX_DIR', '')
+
+
+# A full page of lab report template; only the haemoglobin value differs
+TEMPLATE = (
+    'CITY PATHOLOGY LABORATORY  Patient: J. Doe  DOB 01/02/1980  '
+    'Collected 03/04/2026  Complete Blood Count  Test Result Units Reference '
+    'Range  WBC 6.2 x10^9/L (4.0-11.0)  Platelets 250 x10^9/L (150-400)  '
+    'MCV 88 fL (80-100)  MCH 29 pg (27-33)  Neutrophils 3.9 x10^9/L (2.0-7.5)  '
+    'Lymphocytes 1.8 x10^9/L (1.0-4.0)  Eosinophils 0.2 x10^9/L (0.0-0.4)  '
+    'Monocytes 0.5 x10^9/L (0.2-0.8)  Haematocrit 0.41 L/L (0.36-0.46)  '
+    'RBC 4.6 x10^12/L (3.8-5.8)  Comments: sample received in good '
+    'condition. Verified by Dr A. Smith. This report was generated '
+    'electronically and is valid without signature. For queries call the '
+    'laboratory on 0123 456 789.  Haemoglobin {} g/dL'
+)
+
+
+def test_same_template_pages_with_different_values_are_kept():
+    chunks = [TEMPLATE.format('9.1'), TEMPLATE.format('13.4')]
+    assert vector_store._index_rows(chunks) == [0, 1]
+
+    store = vector_store.make_session_index(chunks)
+    assert store['index'].ntotal == 2
+
+
+def test_exact_repeats_fold_into_their_first_copy():
+    chunks = ['Hb 9.1 g/dL', 'Sodium 140', 'Hb  9.1\ng/dL']
+    assert vector_store._index_rows(chunks) == [0, 1]
+
+    vector_store.install_session_index(-1, vector_store.make_session_index(chunks))
+    try:
+        q_vec = _fake_encode(['Hb 9.1 g/dL'])
+        results = vector_store.retrieve_chunks(-1, 'Hb', top_n=5, q_vec=q_vec)
+    finally:
+        vector_store.invalidate_session(-1)
+    assert [r.chunk_index for r in results] == [0, 1]
+
+
+def test_semantic_cache_needs_the_same_retrieved_chunks():
+    vector_store.install_session_index(
+        -2, vector_store.make_session_index(['Sodium 140', 'Potassium 4.1'])
+    )
+    try:
+        q_vec = _fake_encode(['what is my sodium?'])
+        vector_store.remember_answer(-2, q_vec, 'en', (0, 1), 'Sodium is 140 [1].')
+        assert vector_store.find_similar_answer(-2, q_vec, 'en', (0, 1)) == (
+            'Sodium is 140 [1].'
+        )
+        # Same question, but [1] would now cite a different chunk
+        assert vector_store.find_similar_answer(-2, q_vec, 'en', (1, 0)) is None
+        assert vector_store.find_similar_answer(-2, q_vec, 'hi', (0, 1)) is None
+    finally:
+        vector_store.invalidate_session(-2)